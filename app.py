@@ -1,11 +1,13 @@
-from flask import Flask, request, jsonify, render_template, send_file
+from flask import Flask, Response, g, request, jsonify, render_template, send_file, stream_with_context
 from flask_cors import CORS
+from werkzeug.exceptions import RequestEntityTooLarge
 import os
 import sys
 import json
 import datetime
-from PIL import Image
 import io
+import time
+import zipfile
 
 # Add the project root to the Python path
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -13,25 +15,127 @@ sys.path.append(current_dir)
 
 # Import local modules
 from src.config.config import Config
-from src.services.application import ApplicationContext
-from src.utils.helpers import create_pdf
-from src.services.processing import process_image, process_video
+from src.services.application import ApplicationContext, ModelNotReady
+from src.services.reports import get_video_report, get_video_reports
+from src.services.processing import process_image, process_image_batch
+from src.services.ingest import UploadTooLarge, begin_ingest, finish_ingest, read_zip_images, stream_to_file
+from src.services.frame_store import expand_frame_results
+from src.services.history import parse_date_bound, strip_frame_results
+from src.services.jobs import (JobManager, JobStore, JobQueueFull, FINISHED_STATUSES, JOB_CANCELLED,
+                               JOB_COMPLETED, JOB_FAILED)
+from src.services.metrics import RequestProfiler, registry as metrics
+from src.services.retention import create_retention_compactor
 
 # Create configuration and application context
 cfg = Config()
 app_context = ApplicationContext(cfg)
 
-# Initialize the application context
-app_context.initialize()
+# Load the model in the background so the server answers right away;
+# /ready tells when detection requests can be served. This comes before any
+# other thread is started, since the inference pool workers are forked here
+if cfg.get_model_load_in_background():
+    app_context.start_background_initialize()
+else:
+    app_context.initialize()
+
+# Start the background video job workers
+job_manager = JobManager(
+    app_context,
+    JobStore(cfg.get_jobs_db_path()),
+    workers=cfg.get_job_workers(),
+    queue_size=cfg.get_job_queue_size()
+)
+job_manager.start()
+
+# Keep uploads, results and reports within their age and size budgets;
+# videos of unfinished jobs are never touched
+retention = None
+if cfg.get_retention_enabled():
+    retention = create_retention_compactor(app_context, protected=job_manager.get_active_paths)
+    retention.start()
 
 # Create Flask app
 app = Flask(__name__)
+app.config['MAX_CONTENT_LENGTH'] = cfg.get_max_file_size_mb() * 1024 * 1024
 CORS(app, origins=cfg.get_cors_origins())
 
+metrics.enabled = cfg.get_metrics_enabled()
+profiler = RequestProfiler(cfg.get_profile_sample_rate(), cfg.get_profile_dir())
+
+def _queue_depths():
+    depths = {
+        (('queue', 'jobs'),): job_manager.get_queue_depth(),
+        (('queue', 'image_writer'),): app_context.get_image_writer().get_queue_depth()
+    }
+    if app_context.inference_pool is not None:
+        depths[(('queue', 'inference'),)] = app_context.inference_pool.get_queue_depth()
+    return depths
+
+def _cache_stat(*fields):
+    def read():
+        cache = app_context.get_result_cache()
+        if cache is None:
+            return {}
+        stats = cache.get_stats()
+        return {key: stats[field] for key, field in fields}
+    return read
+
+metrics.register_gauge('queue_depth', 'Items waiting in each work queue', _queue_depths)
+metrics.register_gauge('result_cache_hits_total', 'Image result cache hits by tier', _cache_stat(
+    ((('tier', 'memory'),), 'memory_hits'), ((('tier', 'disk'),), 'disk_hits')
+), metric_type='counter')
+metrics.register_gauge('result_cache_misses_total', 'Image result cache misses',
+                       _cache_stat(((), 'misses')), metric_type='counter')
+metrics.register_gauge('result_cache_hit_ratio', 'Share of cache lookups that were hits',
+                       _cache_stat(((), 'hit_rate')))
+
+def _retention_stat(field):
+    def read():
+        if retention is None:
+            return {}
+        return {(('dir', name),): stats[field] for name, stats in retention.get_stats().items()}
+    return read
+
+metrics.register_gauge('artifact_bytes', 'Bytes kept in each artifact directory after the last retention run',
+                       _retention_stat('bytes'))
+metrics.register_gauge('artifact_files', 'Files kept in each artifact directory after the last retention run',
+                       _retention_stat('files'))
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    g.profile = profiler.start()
+
+@app.after_request
+def record_request_time(response):
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    metrics.observe_request(endpoint, response.status_code, time.perf_counter() - g.request_start)
+    return response
+
+@app.teardown_request
+def dump_request_profile(exc):
+    profile = g.pop('profile', None)
+    if profile is not None:
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        profiler.stop(profile, f'{request.method}_{endpoint}')
+
+@app.errorhandler(413)
+def request_too_large(e):
+    return jsonify({'error': f'File exceeds the {request.max_content_length // (1024 * 1024)} MB limit'}), 413
+
 @app.route('/')
 def index():
     return render_template('index.html')
 
+@app.route('/health')
+def health():
+    return jsonify({'status': 'up'})
+
+@app.route('/ready')
+def ready():
+    status = app_context.get_status()
+    return jsonify(status), 200 if status['status'] == 'ready' else 503
+
 @app.route('/upload', methods=['POST'])
 def upload_file():
     if 'file' not in request.files:
@@ -49,50 +153,324 @@ def upload_file():
                 f'{timestamp}_video{os.path.splitext(file.filename)[1]}'
             )
             file.save(video_path)
-            return process_video(app_context, video_path)
+            try:
+                job_id = job_manager.submit(video_path)
+            except (JobQueueFull, ModelNotReady):
+                os.remove(video_path)
+                raise
+            return jsonify({
+                'success': True,
+                'job_id': job_id,
+                'status_url': f'/jobs/{job_id}',
+                'result_url': f'/jobs/{job_id}/result'
+            }), 202
         else:
             image_bytes = file.read()
-            image = Image.open(io.BytesIO(image_bytes))
             
-            process_image(app_context, image)
+            result = process_image(app_context, image_bytes, filename=file.filename)
+            if isinstance(result, tuple):
+                error, status = result
+                return jsonify(error), status
             
             return jsonify({'success': True})
             
+    except (JobQueueFull, ModelNotReady) as e:
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         app.logger.error(f"Error processing file: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/upload/batch', methods=['POST'])
+def upload_batch():
+    """
+    Detect objects in many images at once, sent as several ``files`` fields
+    or as one zip archive.
+
+    Results are streamed as NDJSON, one line per image in upload order as
+    soon as its inference batch is done, then a final line with
+    ``"done": true``, the counts and the ids of the history entries, which
+    are all written in one transaction.
+    """
+    # Must be set before the form is parsed
+    request.max_content_length = cfg.get_batch_max_request_mb() * 1024 * 1024
+    files = [f for f in request.files.getlist('files') + request.files.getlist('file') if f.filename]
+    if not files:
+        return jsonify({'error': 'No files provided'}), 400
+    
+    max_files = cfg.get_batch_max_files()
+    try:
+        uploads = []
+        for file in files:
+            is_zip = file.filename.lower().endswith('.zip') or \
+                file.content_type in ('application/zip', 'application/x-zip-compressed')
+            if is_zip:
+                uploads.extend(read_zip_images(
+                    file.stream,
+                    max_files - len(uploads),
+                    cfg.get_batch_max_uncompressed_mb() * 1024 * 1024
+                ))
+            else:
+                uploads.append((file.filename, file.read()))
+            if len(uploads) > max_files:
+                raise UploadTooLarge(f'Batch holds more than {max_files} images')
+    except UploadTooLarge as e:
+        return jsonify({'error': str(e)}), 413
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if not uploads:
+        return jsonify({'error': 'No images found'}), 400
+    
+    results = process_image_batch(app_context, uploads)
+    try:
+        # The first line is produced here, so a model that is not loaded yet
+        # is reported with a status code instead of inside the stream
+        first = next(results)
+    except ModelNotReady as e:
+        return jsonify({'error': str(e)}), 503
+    except Exception as e:
+        app.logger.error(f"Error processing batch: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+    
+    def generate():
+        yield json.dumps(first, ensure_ascii=False) + '\n'
+        try:
+            for result in results:
+                yield json.dumps(result, ensure_ascii=False) + '\n'
+        except Exception as e:
+            app.logger.error(f"Error processing batch: {str(e)}")
+            yield json.dumps({'done': True, 'error': str(e)}, ensure_ascii=False) + '\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+def _abort_stream_upload(ingest, job_id):
+    # A progressive job already reading the partial file is cancelled first,
+    # so it never records a history entry for a rejected upload
+    if job_id is not None:
+        job_manager.cancel(job_id)
+    finish_ingest(ingest, failed=True)
+    if os.path.exists(ingest.path):
+        os.remove(ingest.path)
+
+@app.route('/upload/stream', methods=['POST'])
+def upload_stream():
+    """
+    Stream a raw video body (not multipart) to disk chunk by chunk.
+
+    The file name goes in the ``filename`` query parameter or the
+    ``X-Filename`` header. For containers listed in
+    ``upload.progressive_extensions`` the analysis job is queued before the
+    upload finishes and starts sampling frames as they arrive.
+    """
+    content_type = request.content_type or ''
+    if not content_type.startswith('video/'):
+        return jsonify({'error': 'Only video uploads can be streamed'}), 400
+    
+    max_bytes = cfg.get_max_file_size_mb() * 1024 * 1024
+    if request.content_length is not None and request.content_length > max_bytes:
+        return request_too_large(None)
+    
+    filename = request.args.get('filename') or request.headers.get('X-Filename', '')
+    extension = os.path.splitext(filename)[1].lower()
+    if not extension[1:].isalnum():
+        extension = ''
+    video_path = os.path.join(
+        app_context.get_uploads_dir(),
+        f'{app_context.get_timestamp()}_video{extension}'
+    )
+    
+    ingest = begin_ingest(video_path)
+    job_id = None
+    try:
+        if extension in cfg.get_progressive_extensions():
+            job_id = job_manager.submit(video_path)
+        
+        stream_to_file(
+            request.stream,
+            ingest,
+            max_bytes,
+            chunk_size=cfg.get_upload_chunk_size_kb() * 1024
+        )
+        finish_ingest(ingest)
+        
+        if job_id is None:
+            job_id = job_manager.submit(video_path)
+    except (UploadTooLarge, RequestEntityTooLarge) as e:
+        _abort_stream_upload(ingest, job_id)
+        return request_too_large(e)
+    except (JobQueueFull, ModelNotReady) as e:
+        _abort_stream_upload(ingest, job_id)
+        return jsonify({'error': str(e)}), 503
+    except Exception as e:
+        _abort_stream_upload(ingest, job_id)
+        app.logger.error(f"Error streaming upload: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+    
+    return jsonify({
+        'success': True,
+        'job_id': job_id,
+        'bytes_received': ingest.bytes_written,
+        'status_url': f'/jobs/{job_id}',
+        'result_url': f'/jobs/{job_id}/result'
+    }), 202
+
+@app.route('/jobs/<job_id>')
+def get_job_status(job_id):
+    job = job_manager.get_job(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    total_frames = job['total_frames']
+    return jsonify({
+        'job_id': job['id'],
+        'status': job['status'],
+        'created_at': job['created_at'],
+        'updated_at': job['updated_at'],
+        'progress': {
+            'processed_frames': job['processed_frames'],
+            'total_frames': total_frames,
+            'percent': round(100 * job['processed_frames'] / total_frames, 1) if total_frames else 0
+        },
+        'error': job['error']
+    })
+
+@app.route('/jobs/<job_id>/events')
+def get_job_events(job_id):
+    """
+    Live progress of a job as server-sent events: ``status``, a ``frame``
+    event with each entry of ``frame_results`` as soon as its inference
+    batch is done, ``progress`` with the frame counts and ETA, and a final
+    ``completed``, ``failed`` or ``cancelled`` event that ends the stream.
+    Reconnecting clients resume after ``Last-Event-ID``.
+    """
+    after_id = request.headers.get('Last-Event-ID', type=int) or request.args.get('after', 0, type=int)
+    events = job_manager.subscribe(job_id, after_id)
+    if events is None:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    def generate():
+        for event in events:
+            if event is None:
+                # Comment line keeping proxies from closing an idle stream
+                yield ': keep-alive\n\n'
+                continue
+            event_id, name, data = event
+            yield f'id: {event_id}\nevent: {name}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n'
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    status = job_manager.cancel(job_id)
+    if status is None:
+        return jsonify({'error': 'Job not found'}), 404
+    if status in FINISHED_STATUSES:
+        return jsonify({'status': status, 'error': 'Job has already finished'}), 409
+    return jsonify({'success': True, 'status': JOB_CANCELLED})
+
+@app.route('/jobs/<job_id>/result')
+def get_job_result(job_id):
+    job = job_manager.get_job(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    if job['status'] == JOB_FAILED:
+        return jsonify({'error': job['error']}), 500
+    if job['status'] != JOB_COMPLETED:
+        return jsonify({'status': job['status'], 'error': 'Job is not finished yet'}), 409
+    
+    # The entry is read from the history, so paths moved by retention are current
+    entry = app_context.get_history_entry(job['history_id']) if job['history_id'] is not None else None
+    if entry is None:
+        return jsonify({'status': job['status'], 'error': 'History entry of this job no longer exists'}), 404
+    result = expand_frame_results(entry)
+    return jsonify({
+        'success': True,
+        'frame_results': result['frame_results'],
+        'summary': result['summary'],
+        'history_entry': result
+    })
+
+@app.route('/cache/stats')
+def get_cache_stats():
+    cache = app_context.get_result_cache()
+    if cache is None:
+        return jsonify({'enabled': False})
+    return jsonify({'enabled': True, **cache.get_stats()})
+
+@app.route('/metrics')
+def get_metrics():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/history')
 def get_request_history():
-    history = app_context.get_history()
-    return jsonify(history)
+    """
+    Paginated history.
 
-@app.route('/report', methods=['GET'])
-def generate_report():
-    history = app_context.get_history()
+    Query parameters: ``limit``, ``cursor`` (the ``next_cursor`` of the
+    previous page), ``order`` (``asc``/``desc``), ``type``, ``start``/``end``
+    (date or ISO timestamp), ``include_frames`` (``1`` rebuilds the
+    ``frame_results`` of video entries from their frame store; otherwise only
+    ``frames_processed`` is returned) and ``format=ndjson`` to stream entries
+    line by line.
+    """
+    try:
+        stream = request.args.get('format') == 'ndjson'
+        descending = request.args.get('order', 'asc') == 'desc'
+        include_frames = request.args.get('include_frames', '0') not in ('0', 'false')
+        cursor = request.args.get('cursor', type=int)
+        limit = request.args.get('limit', type=int)
+        if limit is None and not stream:
+            limit = cfg.get_history_page_size()
+        if limit is not None:
+            limit = max(1, min(limit, cfg.get_history_max_page_size()))
+        filters = {
+            'entry_type': request.args.get('type'),
+            'start': parse_date_bound(request.args.get('start')),
+            'end': parse_date_bound(request.args.get('end'), end=True)
+        }
+    except ValueError as e:
+        return jsonify({'error': f'Invalid query parameter: {e}'}), 400
     
-    stats = {
-        'total_requests': len(history),
-        'total_detections': 0,
-        'timeline': {}
-    }
+    store = app_context.get_history_store()
     
-    for entry in history:
-        if 'detections' in entry:
-            stats['total_detections'] += len(entry['detections'])
-        elif 'frame_results' in entry:
-            for frame in entry['frame_results']:
-                stats['total_detections'] += len(frame['detections'])
+    if stream:
+        def generate():
+            for entry in store.query(after_id=cursor, limit=limit, descending=descending, **filters):
+                entry = expand_frame_results(entry) if include_frames else strip_frame_results(entry)
+                yield json.dumps(entry, ensure_ascii=False) + '\n'
         
-        date = entry['timestamp'][:10]
-        if date not in stats['timeline']:
-            stats['timeline'][date] = 0
-        stats['timeline'][date] += 1
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    
+    # Fetch one extra entry to know whether another page follows
+    entries = list(store.query(after_id=cursor, limit=limit + 1, descending=descending, **filters))
+    next_cursor = None
+    if len(entries) > limit:
+        entries = entries[:limit]
+        next_cursor = entries[-1]['id']
+    if include_frames:
+        entries = [expand_frame_results(entry) for entry in entries]
+    else:
+        entries = [strip_frame_results(entry) for entry in entries]
+    
+    return jsonify({
+        'entries': entries,
+        'next_cursor': next_cursor
+    })
+
+@app.route('/report', methods=['GET'])
+def generate_report():
+    stats = app_context.get_history_store().get_statistics()
     
     report = {
         'generated_at': datetime.datetime.now().isoformat(),
         'statistics': stats,
-        'recent_entries': history[-10:]
+        'recent_entries': list(reversed([
+            strip_frame_results(entry)
+            for entry in app_context.get_history_store().query(limit=10, descending=True)
+        ]))
     }
     
     report_filename = os.path.join(
@@ -104,33 +482,62 @@ def generate_report():
     
     return send_file(report_filename, as_attachment=True)
 
+def _get_video_entry(video_id):
+    try:
+        video_entry = app_context.get_history_entry(int(video_id))
+    except (TypeError, ValueError):
+        return None
+    if video_entry and video_entry['type'] != 'video_analysis':
+        return None
+    return video_entry
+
 @app.route('/generate-pdf-report', methods=['POST'])
 def create_pdf_report():
+    """
+    PDF report of one video (``video_id``), or a zip of reports for several
+    videos (``video_ids``) rendered in parallel.
+    """
     try:
         data = request.get_json()
-        if not data or 'video_id' not in data:
+        if not data or ('video_id' not in data and 'video_ids' not in data):
             return jsonify({'error': 'No video ID provided'}), 400
         
-        video_id = data['video_id']
-        history = app_context.get_history()
-        
-        video_entry = None
-        for entry in history:
-            if entry['id'] == video_id and entry['type'] == 'video_analysis':
-                video_entry = entry
-                break
+        if 'video_ids' in data:
+            video_ids = data['video_ids']
+            if not isinstance(video_ids, list) or not video_ids:
+                return jsonify({'error': 'Invalid video IDs'}), 400
+            video_ids = list(dict.fromkeys(video_ids))
+            video_entries = [_get_video_entry(video_id) for video_id in video_ids]
+            missing = [video_id for video_id, entry in zip(video_ids, video_entries) if not entry]
+            if missing:
+                return jsonify({'error': 'Video analysis not found', 'video_ids': missing}), 404
+            
+            pdf_paths = get_video_reports(app_context, video_entries)
+            
+            archive = io.BytesIO()
+            with zipfile.ZipFile(archive, 'w', zipfile.ZIP_STORED) as zf:
+                for entry, pdf_path in zip(video_entries, pdf_paths):
+                    zf.write(pdf_path, f"video_analysis_report_{entry['id']}.pdf")
+            archive.seek(0)
+            return send_file(
+                archive,
+                as_attachment=True,
+                download_name=f'video_analysis_reports_{app_context.get_timestamp()}.zip',
+                mimetype='application/zip'
+            )
         
+        video_entry = _get_video_entry(data['video_id'])
         if not video_entry:
             return jsonify({'error': 'Video analysis not found'}), 404
         
-        pdf_filename = os.path.join(
-            app_context.get_reports_dir(),
-            f'video_analysis_report_{app_context.get_timestamp()}.pdf'
-        )
-        
-        create_pdf(pdf_filename, video_entry)
+        pdf_filename = get_video_report(app_context, video_entry)
         
-        return send_file(pdf_filename, as_attachment=True, mimetype='application/pdf')
+        return send_file(
+            pdf_filename,
+            as_attachment=True,
+            download_name=f"video_analysis_report_{video_entry['id']}.pdf",
+            mimetype='application/pdf'
+        )
         
     except Exception as e:
         app.logger.error(f"Error generating PDF report: {str(e)}")
@@ -0,0 +1,90 @@
+"""
+Compare inference latency and throughput of the model backends.
+
+Runs every backend over the same images (a directory of samples, or
+synthetic images when none is given) after a short warm-up:
+
+    python benchmarks/backend_benchmark.py --images static/uploads --backends torch onnx openvino
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.config.config import Config
+from src.services.backends import MODEL_BACKENDS, load_model, resolve_model_artifact
+
+
+def load_images(images_dir, count, width, height):
+    if images_dir:
+        paths = sorted(glob.glob(os.path.join(images_dir, '*.jpg')) + glob.glob(os.path.join(images_dir, '*.png')))
+        return [Image.open(path).convert('RGB') for path in paths[:count]]
+    rng = np.random.default_rng(0)
+    return [Image.fromarray(rng.integers(0, 255, (height, width, 3), dtype=np.uint8)) for _ in range(count)]
+
+
+def benchmark_backend(cfg, backend, images, warmup, batch_size):
+    artifact = resolve_model_artifact(cfg.get_model_path(), backend, imgsz=cfg.get_model_export_imgsz())
+    model = load_model(artifact)
+    params = {'conf': cfg.get_model_confidence(), 'iou': cfg.get_model_iou(), 'verbose': False}
+
+    for image in images[:warmup]:
+        model(image, **params)
+
+    latencies = []
+    for image in images:
+        start = time.perf_counter()
+        model(image, **params)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for i in range(0, len(images), batch_size):
+        model(images[i:i + batch_size], **params)
+    batch_seconds = time.perf_counter() - start
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        'backend': backend,
+        'mean_ms': float(latencies_ms.mean()),
+        'p50_ms': float(np.percentile(latencies_ms, 50)),
+        'p95_ms': float(np.percentile(latencies_ms, 95)),
+        'images_per_second': len(images) / batch_seconds
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--backends', nargs='+', default=list(MODEL_BACKENDS), choices=MODEL_BACKENDS)
+    parser.add_argument('--images', help='Directory with sample .jpg/.png images')
+    parser.add_argument('--count', type=int, default=50)
+    parser.add_argument('--width', type=int, default=1280)
+    parser.add_argument('--height', type=int, default=720)
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--config', default='config.yaml')
+    args = parser.parse_args()
+
+    cfg = Config(args.config)
+    images = load_images(args.images, args.count, args.width, args.height)
+    if not images:
+        parser.error('No images found')
+
+    print(f"{'backend':>9} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'img/s':>9}")
+    for backend in args.backends:
+        try:
+            result = benchmark_backend(cfg, backend, images, args.warmup, args.batch_size)
+        except Exception as e:
+            print(f"{backend:>9} failed: {e}")
+            continue
+        print(f"{result['backend']:>9} {result['mean_ms']:>9.1f} {result['p50_ms']:>9.1f} "
+              f"{result['p95_ms']:>9.1f} {result['images_per_second']:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
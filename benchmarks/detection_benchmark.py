@@ -0,0 +1,123 @@
+"""
+Micro-benchmark of turning model results into detections, summary and
+drawn boxes for images with many boxes.
+
+Compares the previous per-box walk (``int(box.cls[0])``, ``float(box.conf[0])``,
+``box.xyxy[0].tolist()`` for every box, the quadratic summary and a second
+walk for drawing) with the current whole-array extraction. Results hold
+torch tensors like ultralytics does when torch is installed, NumPy arrays
+otherwise:
+
+    python benchmarks/detection_benchmark.py --boxes 10 100 300 1000 --repeats 200
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.services.detections import count_classes, extract_boxes, to_detections
+from src.utils.helpers import draw_boxes
+
+try:
+    import torch
+except ImportError:
+    torch = None
+
+NAMES = {i: f'class_{i}' for i in range(80)}
+
+
+class _Boxes:
+    # The part of ultralytics' Boxes the pipeline uses: whole tensors, and
+    # iteration yielding one-box views
+    def __init__(self, xyxy, conf, cls):
+        self.xyxy = xyxy
+        self.conf = conf
+        self.cls = cls
+
+    def __len__(self):
+        return len(self.conf)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield _Boxes(self.xyxy[i:i + 1], self.conf[i:i + 1], self.cls[i:i + 1])
+
+
+class _Result:
+    def __init__(self, boxes):
+        self.boxes = boxes
+
+
+def make_result(count, width, height, seed=0):
+    rng = np.random.default_rng(seed)
+    x1 = rng.uniform(0, width * 0.9, count)
+    y1 = rng.uniform(0, height * 0.9, count)
+    xyxy = np.stack([x1, y1, x1 + rng.uniform(5, width * 0.1, count), y1 + rng.uniform(5, height * 0.1, count)], 1)
+    conf = rng.uniform(0.25, 1.0, count)
+    cls = rng.integers(0, len(NAMES), count).astype(np.float32)
+    arrays = [xyxy.astype(np.float32), conf.astype(np.float32), cls]
+    if torch is not None:
+        arrays = [torch.from_numpy(a) for a in arrays]
+    return _Result(_Boxes(*arrays))
+
+
+def legacy(image, results):
+    detections = []
+    for result in results:
+        for box in result.boxes:
+            detections.append({
+                'class': NAMES[int(box.cls[0])],
+                'confidence': float(box.conf[0]),
+                'bbox': box.xyxy[0].tolist()
+            })
+    summary = {d['class']: sum(1 for d in detections if d['class'] == d['class']) for d in detections}
+    for result in results:
+        draw_boxes(image, [box.xyxy[0].tolist() for box in result.boxes])
+    return detections, summary
+
+
+def current(image, results):
+    xyxy, conf, cls = extract_boxes(results)
+    detections = to_detections(NAMES, xyxy, conf, cls)
+    summary = count_classes(NAMES, cls)
+    draw_boxes(image, xyxy)
+    return detections, summary
+
+
+def measure(fn, image, results, repeats):
+    fn(image, results)
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(image, results)
+        latencies.append(time.perf_counter() - start)
+    latencies_ms = np.array(latencies) * 1000
+    return float(np.median(latencies_ms)), float(np.percentile(latencies_ms, 95))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--boxes', nargs='+', type=int, default=[10, 100, 300, 1000])
+    parser.add_argument('--repeats', type=int, default=100)
+    parser.add_argument('--width', type=int, default=1920)
+    parser.add_argument('--height', type=int, default=1080)
+    args = parser.parse_args()
+
+    image = np.zeros((args.height, args.width, 3), dtype=np.uint8)
+    print(f"tensors: {'torch' if torch is not None else 'numpy'}")
+    print(f"{'boxes':>6} {'path':>8} {'median ms':>10} {'p95 ms':>9}")
+    for count in args.boxes:
+        results = [make_result(count, args.width, args.height)]
+        legacy_detections, _ = legacy(image, results)
+        current_detections, summary = current(image, results)
+        assert len(legacy_detections) == len(current_detections) == sum(summary.values())
+        for name, fn in (('legacy', legacy), ('current', current)):
+            median_ms, p95_ms = measure(fn, image, results, args.repeats)
+            print(f'{count:>6} {name:>8} {median_ms:>10.3f} {p95_ms:>9.3f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""
+Measure per-request latency and allocations of the image pipeline.
+
+Compares the previous PIL-based path (decode, RGB convert, JPEG re-encode,
+PIL inference input, array round trip for drawing, PIL encode) with the
+current single-buffer path. Both use a stub model, so only the image
+handling is measured:
+
+    python benchmarks/image_path_benchmark.py --width 1920 --height 1080 --requests 30
+"""
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+from PIL import Image
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils.helpers import decode_image, draw_boxes, encode_jpeg
+
+
+class _Boxes:
+    def __init__(self, xyxy):
+        self.xyxy = xyxy
+        self.conf = np.full(len(xyxy), 0.9, dtype=np.float32)
+        self.cls = np.zeros(len(xyxy), dtype=np.float32)
+
+    def __iter__(self):
+        for i in range(len(self.xyxy)):
+            yield _Boxes(self.xyxy[i:i + 1])
+
+
+class _Result:
+    def __init__(self, boxes):
+        self.boxes = boxes
+
+
+class StubModel:
+    names = {0: 'teddy bear'}
+
+    def __call__(self, source, **kwargs):
+        img = np.asarray(source)
+        height, width = img.shape[:2]
+        xyxy = np.array([[width * 0.1, height * 0.1, width * 0.4, height * 0.4],
+                         [width * 0.5, height * 0.5, width * 0.9, height * 0.9]], dtype=np.float32)
+        return [_Result(_Boxes(xyxy))]
+
+
+def draw_detections(image, results):
+    """
+    Draw detection boxes the way the PIL-based path did: the PIL image is
+    copied to an array, drawn on and converted back.
+    """
+    img = np.array(image)
+    if len(img.shape) == 2:
+        img = cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
+
+    for result in results:
+        draw_boxes(img, result.boxes.xyxy)
+
+    return Image.fromarray(img)
+
+
+def legacy_path(image_bytes, model, out_dir):
+    image = Image.open(io.BytesIO(image_bytes))
+    if image.mode == 'RGBA':
+        image = image.convert('RGB')
+    image.save(os.path.join(out_dir, 'original.jpg'), 'JPEG', quality=95)
+    results = model(image)
+    result_image = draw_detections(image, results)
+    result_image.save(os.path.join(out_dir, 'result.jpg'), 'JPEG', quality=95)
+
+
+def current_path(image_bytes, model, out_dir):
+    image = decode_image(image_bytes)
+    with open(os.path.join(out_dir, 'original.bin'), 'wb') as f:
+        f.write(image_bytes)
+    results = model(image)
+    with open(os.path.join(out_dir, 'result.jpg'), 'wb') as f:
+        f.write(encode_jpeg(draw_boxes(image, results[0].boxes.xyxy), 95))
+
+
+def measure(path_fn, image_bytes, model, out_dir, requests):
+    path_fn(image_bytes, model, out_dir)
+
+    latencies = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        path_fn(image_bytes, model, out_dir)
+        latencies.append(time.perf_counter() - start)
+
+    # NumPy buffers are traced; PIL and OpenCV internals are not
+    tracemalloc.start()
+    path_fn(image_bytes, model, out_dir)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        'mean_ms': float(latencies_ms.mean()),
+        'p95_ms': float(np.percentile(latencies_ms, 95)),
+        'peak_mb': peak / 1024 / 1024
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--width', type=int, default=1920)
+    parser.add_argument('--height', type=int, default=1080)
+    parser.add_argument('--format', default='PNG', choices=['PNG', 'JPEG'])
+    parser.add_argument('--requests', type=int, default=30)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    pixels = rng.integers(0, 255, (args.height, args.width, 4), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels, 'RGBA' if args.format == 'PNG' else None).convert(
+        'RGBA' if args.format == 'PNG' else 'RGB').save(buffer, args.format)
+    image_bytes = buffer.getvalue()
+
+    model = StubModel()
+    print(f"{'path':>8} {'mean ms':>9} {'p95 ms':>9} {'peak MB':>9}")
+    with tempfile.TemporaryDirectory() as out_dir:
+        for name, path_fn in (('legacy', legacy_path), ('current', current_path)):
+            result = measure(path_fn, image_bytes, model, out_dir, args.requests)
+            print(f"{name:>8} {result['mean_ms']:>9.1f} {result['p95_ms']:>9.1f} {result['peak_mb']:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
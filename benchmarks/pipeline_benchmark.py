@@ -0,0 +1,334 @@
+"""
+End-to-end benchmark of the detection pipeline on synthetic inputs.
+
+Generates images and videos of the requested size, then runs each scenario
+at every concurrency level, either calling ``process_image`` /
+``analyze_video`` directly or going through the Flask test client
+(``/upload`` and, for videos, polling ``/jobs/<id>`` until the job is done).
+The model is replaced by a stub, so no weights are needed; ``--model-latency-ms``
+simulates per-frame inference time.
+
+Results (p50/p95/p99 latency, throughput, peak RSS) are printed as JSON:
+
+    python benchmarks/pipeline_benchmark.py --scenarios image_direct image_http \\
+        --concurrency 1 4 8 --requests 40 --width 1280 --height 720 --output bench.json
+
+All files are written to a temporary directory that is removed afterwards.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+import yaml
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+SCENARIOS = ('image_direct', 'image_http', 'video_direct', 'video_http')
+
+
+class _Array(np.ndarray):
+    # ultralytics tensors are moved to NumPy with .cpu().numpy()
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return np.asarray(self)
+
+
+class _Boxes:
+    def __init__(self, xyxy, conf, cls):
+        self.xyxy = np.asarray(xyxy, dtype=np.float32).reshape(-1, 4).view(_Array)
+        self.conf = np.asarray(conf, dtype=np.float32).reshape(-1).view(_Array)
+        self.cls = np.asarray(cls, dtype=np.float32).reshape(-1).view(_Array)
+
+    def __len__(self):
+        return len(self.conf)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield _Boxes(self.xyxy[i:i + 1], self.conf[i:i + 1], self.cls[i:i + 1])
+
+
+class _Result:
+    def __init__(self, boxes):
+        self.boxes = boxes
+
+
+class StubModel:
+    """
+    Returns ``detections`` fixed boxes per image after sleeping
+    ``latency`` seconds per image, standing in for the YOLO model.
+    """
+
+    names = {0: 'teddy bear', 1: 'ball', 2: 'car'}
+
+    def __init__(self, detections=3, latency=0.0):
+        self.detections = detections
+        self.latency = latency
+
+    def __call__(self, source, **kwargs):
+        images = source if isinstance(source, list) else [source]
+        if self.latency:
+            time.sleep(self.latency * len(images))
+        results = []
+        for image in images:
+            height, width = np.asarray(image).shape[:2]
+            offsets = [(0.05 + 0.3 * i) % 0.7 for i in range(self.detections)]
+            xyxy = [[width * x, height * 0.2, width * (x + 0.25), height * 0.6] for x in offsets]
+            results.append(_Result(_Boxes(xyxy, [0.9 - 0.1 * i for i in range(self.detections)],
+                                          [i % len(self.names) for i in range(self.detections)])))
+        return results
+
+
+def make_image(path, width, height, image_format):
+    rng = np.random.default_rng(0)
+    image = rng.integers(0, 255, (height, width, 3), dtype=np.uint8)
+    for i in range(5):
+        x, y = int(width * (0.1 + 0.15 * i)), int(height * (0.2 + 0.1 * i))
+        cv2.rectangle(image, (x, y), (x + width // 8, y + height // 8), (40 * i, 255 - 40 * i, 128), -1)
+    ok, buffer = cv2.imencode('.png' if image_format == 'png' else '.jpg', image)
+    with open(path, 'wb') as f:
+        f.write(buffer.tobytes())
+
+
+def make_video(path, width, height, seconds, fps):
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    rng = np.random.default_rng(0)
+    background = rng.integers(0, 255, (height, width, 3), dtype=np.uint8)
+    for i in range(int(seconds * fps)):
+        frame = background.copy()
+        x = (i * 8) % max(1, width - width // 5)
+        cv2.rectangle(frame, (x, height // 3), (x + width // 5, height // 3 + height // 4), (0, 0, 255), -1)
+        writer.write(frame)
+    writer.release()
+
+
+def write_config(work_dir, args):
+    with open(os.path.join(ROOT, 'config.yaml'), 'r', encoding='utf-8') as f:
+        config = yaml.safe_load(f)
+    config['model']['path'] = 'model.pt'
+    config['model']['backend'] = 'torch'
+    config['inference']['workers'] = args.inference_workers
+    config['jobs']['workers'] = args.job_workers
+    config['jobs']['queue_size'] = max(config['jobs']['queue_size'], args.requests)
+    config['cache']['enabled'] = args.cache
+    config['frontend']['max_file_size_mb'] = 1024
+    with open(os.path.join(work_dir, 'config.yaml'), 'w', encoding='utf-8') as f:
+        yaml.safe_dump(config, f)
+    # An existing weights file skips the download
+    open(os.path.join(work_dir, 'model.pt'), 'wb').close()
+
+
+def load_app(args):
+    """
+    Import app.py against the temporary config with the stub model in place
+    of the real one (inference pool workers are forked and inherit it).
+    """
+    from src.services import backends
+
+    backends.load_model = lambda artifact_path: StubModel(args.detections, args.model_latency_ms / 1000)
+    import app
+    if not app.app_context.wait_until_ready(300):
+        raise RuntimeError(f'Model did not load: {app.app_context.get_status()}')
+    return app
+
+
+def get_peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+def run_image_direct(app, image_bytes):
+    from src.services.processing import process_image
+
+    result = process_image(app.app_context, image_bytes, filename='bench.png')
+    return not isinstance(result, tuple)
+
+
+def run_video_direct(app, video_path):
+    from src.services.processing import analyze_video
+
+    analyze_video(app.app_context, video_path)
+    return True
+
+
+_clients = threading.local()
+
+
+def _client(app):
+    if not hasattr(_clients, 'client'):
+        _clients.client = app.app.test_client()
+    return _clients.client
+
+
+def run_image_http(app, image_bytes):
+    response = _client(app).post(
+        '/upload',
+        data={'file': (io.BytesIO(image_bytes), 'bench.png', 'image/png')},
+        content_type='multipart/form-data'
+    )
+    return response.status_code == 200
+
+
+def run_video_http(app, video_bytes, poll_interval=0.02):
+    from src.services.jobs import FINISHED_STATUSES, JOB_COMPLETED
+
+    client = _client(app)
+    response = client.post(
+        '/upload',
+        data={'file': (io.BytesIO(video_bytes), 'bench.mp4', 'video/mp4')},
+        content_type='multipart/form-data'
+    )
+    if response.status_code != 202:
+        return False
+    status_url = response.get_json()['status_url']
+    while True:
+        status = client.get(status_url).get_json()['status']
+        if status in FINISHED_STATUSES:
+            return status == JOB_COMPLETED
+        time.sleep(poll_interval)
+
+
+def measure(run, requests, concurrency):
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def one():
+        nonlocal errors
+        start = time.perf_counter()
+        try:
+            ok = run()
+        except Exception as e:
+            print(f'Request failed: {e}', file=sys.stderr)
+            ok = False
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            if not ok:
+                errors += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for future in [executor.submit(one) for _ in range(requests)]:
+            future.result()
+    wall = time.perf_counter() - start
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        'requests': requests,
+        'errors': errors,
+        'p50_ms': float(np.percentile(latencies_ms, 50)),
+        'p95_ms': float(np.percentile(latencies_ms, 95)),
+        'p99_ms': float(np.percentile(latencies_ms, 99)),
+        'mean_ms': float(latencies_ms.mean()),
+        'throughput_rps': requests / wall if wall > 0 else 0.0,
+        'wall_seconds': wall,
+        'peak_rss_mb': get_peak_rss_mb()
+    }
+
+
+def get_git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=ROOT, text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenarios', nargs='+', default=list(SCENARIOS), choices=SCENARIOS)
+    parser.add_argument('--concurrency', nargs='+', type=int, default=[1, 4])
+    parser.add_argument('--requests', type=int, default=20, help='requests per scenario and concurrency level')
+    parser.add_argument('--video-requests', type=int, default=4)
+    parser.add_argument('--width', type=int, default=1280)
+    parser.add_argument('--height', type=int, default=720)
+    parser.add_argument('--image-format', default='png', choices=['png', 'jpeg'])
+    parser.add_argument('--video-seconds', type=float, default=10)
+    parser.add_argument('--fps', type=int, default=25)
+    parser.add_argument('--detections', type=int, default=3, help='boxes the stub model returns per image')
+    parser.add_argument('--model-latency-ms', type=float, default=0.0, help='simulated inference time per image')
+    parser.add_argument('--inference-workers', type=int, default=0)
+    parser.add_argument('--job-workers', type=int, default=1)
+    parser.add_argument('--cache', action='store_true', help='keep the image result cache on')
+    parser.add_argument('--output', help='write the JSON report here as well as to stdout')
+    args = parser.parse_args()
+
+    output_path = os.path.abspath(args.output) if args.output else None
+    work_dir = tempfile.mkdtemp(prefix='pipeline_benchmark_')
+    os.chdir(work_dir)
+    write_config(work_dir, args)
+
+    image_path = os.path.join(work_dir, f'input.{args.image_format}')
+    video_path = os.path.join(work_dir, 'input.mp4')
+    make_image(image_path, args.width, args.height, args.image_format)
+    with open(image_path, 'rb') as f:
+        image_bytes = f.read()
+    if any(s.startswith('video') for s in args.scenarios):
+        make_video(video_path, args.width, args.height, args.video_seconds, args.fps)
+        with open(video_path, 'rb') as f:
+            video_bytes = f.read()
+
+    app = load_app(args)
+    runners = {
+        'image_direct': lambda: run_image_direct(app, image_bytes),
+        'image_http': lambda: run_image_http(app, image_bytes),
+        'video_direct': lambda: run_video_direct(app, video_path),
+        'video_http': lambda: run_video_http(app, video_bytes)
+    }
+
+    results = []
+    for scenario in args.scenarios:
+        requests = args.video_requests if scenario.startswith('video') else args.requests
+        for concurrency in args.concurrency:
+            # One untimed request warms up lazily created pools and stores
+            runners[scenario]()
+            result = measure(runners[scenario], requests, concurrency)
+            result.update(scenario=scenario, concurrency=concurrency)
+            results.append(result)
+            print(f"{scenario:>13} c={concurrency:<3} p50 {result['p50_ms']:8.1f} ms  "
+                  f"p95 {result['p95_ms']:8.1f} ms  p99 {result['p99_ms']:8.1f} ms  "
+                  f"{result['throughput_rps']:7.2f} req/s", file=sys.stderr)
+
+    report = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': get_git_commit(),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count()
+        },
+        'parameters': {k: v for k, v in vars(args).items() if k != 'output'},
+        'results': results
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if output_path:
+        with open(output_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+
+    shutil.rmtree(work_dir, ignore_errors=True)
+    # os._exit skips the multiprocessing cleanup, so pool workers are stopped first
+    if app.app_context.inference_pool is not None:
+        app.app_context.inference_pool.shutdown()
+    # Worker threads are daemons blocked on their queues; skip waiting on them
+    os._exit(0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Compare frame sampling strategies on synthetic videos.
+
+Reports, per video length, how many frames each strategy decodes and how
+long it takes to walk the whole video:
+
+    python benchmarks/sampling_benchmark.py --durations 10 60 300 --fps 30
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.config.config import Config
+from src.services.sampling import FrameSampler, compute_frame_interval
+
+
+def make_video(path, duration, fps, width, height):
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    rng = np.random.default_rng(0)
+    base = rng.integers(0, 255, (height, width, 3), dtype=np.uint8)
+    for i in range(int(duration * fps)):
+        frame = np.roll(base, i * 4, axis=1)
+        cv2.putText(frame, str(i), (10, height // 2), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+        writer.write(frame)
+    writer.release()
+
+
+def run_read_all(path, frame_interval):
+    cap = cv2.VideoCapture(path)
+    decoded = 0
+    sampled = 0
+    start = time.perf_counter()
+    while True:
+        ret, _ = cap.read()
+        if not ret:
+            break
+        if decoded % frame_interval == 0:
+            sampled += 1
+        decoded += 1
+    elapsed = time.perf_counter() - start
+    cap.release()
+    return {'mode': 'read_all', 'sampled': sampled, 'frames_decoded': decoded,
+            'frames_grabbed': 0, 'seconds': elapsed}
+
+
+def run_sampler(path, frame_interval, mode):
+    cap = cv2.VideoCapture(path)
+    sampler = FrameSampler(cap, frame_interval, mode=mode)
+    start = time.perf_counter()
+    sampled = sum(1 for _ in sampler)
+    elapsed = time.perf_counter() - start
+    cap.release()
+    stats = sampler.get_stats()
+    return {'mode': mode, 'sampled': sampled, 'frames_decoded': stats['frames_decoded'],
+            'frames_grabbed': stats['frames_grabbed'], 'seconds': elapsed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--durations', type=float, nargs='+', default=[10, 60, 300])
+    parser.add_argument('--fps', type=int, default=30)
+    parser.add_argument('--width', type=int, default=640)
+    parser.add_argument('--height', type=int, default=360)
+    parser.add_argument('--config', default='config.yaml')
+    args = parser.parse_args()
+
+    cfg = Config(args.config)
+
+    print(f"{'duration':>9} {'interval':>9} {'mode':>9} {'sampled':>8} {'decoded':>8} {'grabbed':>8} {'seconds':>8}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for duration in args.durations:
+            path = os.path.join(tmp_dir, f'synthetic_{int(duration)}s.mp4')
+            make_video(path, duration, args.fps, args.width, args.height)
+
+            interval_seconds = compute_frame_interval(cfg, duration)
+            frame_interval = max(1, int(round(args.fps * interval_seconds)))
+
+            runs = [run_read_all(path, frame_interval)]
+            runs += [run_sampler(path, frame_interval, mode) for mode in ('grab', 'seek')]
+            for run in runs:
+                print(f"{duration:>9.0f} {interval_seconds:>9.2f} {run['mode']:>9} {run['sampled']:>8} "
+                      f"{run['frames_decoded']:>8} {run['frames_grabbed']:>8} {run['seconds']:>8.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+"""
+Measure cold-start time of the web app against an import-time budget.
+
+Each run imports ``app.py`` in a fresh interpreter (from a temporary
+directory holding a copy of the config) and records how long the import
+takes and when ``/health`` first answers. The slowest imports of the first
+run are listed from ``-X importtime``. Exits with status 1 when the median
+import time exceeds the budget, so it can gate CI:
+
+    python benchmarks/startup_benchmark.py --runs 5 --budget-ms 1500
+
+With ``--wait-ready`` the time until ``/ready`` reports the model as loaded
+is measured too; this needs the real weights and ultralytics.
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+import yaml
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r'''
+import json, sys, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+client = app.app.test_client()
+client.get('/health')
+serving = time.perf_counter()
+ready = None
+if {wait_ready}:
+    while client.get('/ready').status_code != 200:
+        if app.app_context.get_status()['status'] == 'failed':
+            break
+        time.sleep(0.05)
+    else:
+        ready = time.perf_counter()
+print(json.dumps({{
+    'import_ms': (imported - start) * 1000,
+    'health_ms': (serving - start) * 1000,
+    'ready_ms': (ready - start) * 1000 if ready else None
+}}))
+'''
+
+
+def write_config(work_dir, wait_ready):
+    with open(os.path.join(ROOT, 'config.yaml'), 'r', encoding='utf-8') as f:
+        config = yaml.safe_load(f)
+    if not wait_ready:
+        # Keep the background loader off the network and out of the timings
+        config['model']['path'] = 'model.pt'
+        open(os.path.join(work_dir, 'model.pt'), 'wb').close()
+    else:
+        config['model']['path'] = os.path.join(ROOT, config['model']['path'])
+    with open(os.path.join(work_dir, 'config.yaml'), 'w', encoding='utf-8') as f:
+        yaml.safe_dump(config, f)
+
+
+def run_once(work_dir, wait_ready, importtime=False):
+    env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    command = [sys.executable]
+    if importtime:
+        command += ['-X', 'importtime']
+    command += ['-c', CHILD.format(wait_ready=wait_ready)]
+    completed = subprocess.run(command, cwd=work_dir, env=env, capture_output=True, text=True)
+    lines = [line for line in completed.stdout.splitlines() if line.startswith('{')]
+    if completed.returncode != 0 or not lines:
+        raise RuntimeError(f'Import failed:\n{completed.stderr[-2000:]}')
+    return json.loads(lines[-1]), completed.stderr
+
+
+def slowest_imports(importtime_log, top):
+    """
+    Top-level packages by cumulative import time from ``-X importtime``.
+    """
+    packages = {}
+    for line in importtime_log.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line[len('import time:'):].split('|'))
+        package = name.split('.')[0]
+        if package == 'app':
+            continue
+        # The outermost import of a package has the largest cumulative time
+        packages[package] = max(packages.get(package, 0), int(cumulative) / 1000)
+    return sorted(packages.items(), key=lambda item: -item[1])[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget-ms', type=float, default=1500)
+    parser.add_argument('--top', type=int, default=10, help='slowest imports to list')
+    parser.add_argument('--wait-ready', action='store_true')
+    parser.add_argument('--output', help='write the JSON report here as well as to stdout')
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='startup_benchmark_')
+    try:
+        write_config(work_dir, args.wait_ready)
+        _, importtime_log = run_once(work_dir, args.wait_ready, importtime=True)
+        runs = [run_once(work_dir, args.wait_ready)[0] for _ in range(args.runs)]
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    import_ms = statistics.median(run['import_ms'] for run in runs)
+    ready_runs = [run['ready_ms'] for run in runs if run['ready_ms'] is not None]
+    report = {
+        'runs': runs,
+        'median_import_ms': import_ms,
+        'median_health_ms': statistics.median(run['health_ms'] for run in runs),
+        'median_ready_ms': statistics.median(ready_runs) if ready_runs else None,
+        'budget_ms': args.budget_ms,
+        'within_budget': import_ms <= args.budget_ms,
+        'slowest_imports_ms': dict(slowest_imports(importtime_log, args.top))
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+    if not report['within_budget']:
+        print(f'Import took {import_ms:.0f} ms, over the {args.budget_ms:.0f} ms budget', file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,6 @@
 import os
 import yaml
-from typing import Dict, Any
+from typing import Dict, Any, List
 
 class Config:
     
@@ -50,6 +50,42 @@ class Config:
     def get_yandex_disk_url(self) -> str:
         return self.get('model.yandex_disk_url', '')
     
+    def get_model_backend(self) -> str:
+        return self.get('model.backend', 'torch')
+    
+    def get_model_sha256(self) -> str:
+        return self.get('model.sha256', '') or ''
+    
+    def get_model_version(self) -> str:
+        return self.get('model.version', '') or ''
+    
+    def get_model_cache_dir(self) -> str:
+        return self.get('model.cache_dir', 'models')
+    
+    def get_model_download_timeout(self) -> float:
+        return self.get('model.download_timeout_seconds', 30)
+    
+    def get_model_download_retries(self) -> int:
+        return self.get('model.download_retries', 3)
+    
+    def get_model_download_chunk_kb(self) -> int:
+        return self.get('model.download_chunk_kb', 1024)
+    
+    def get_model_warmup(self) -> bool:
+        return self.get('model.warmup', True)
+    
+    def get_model_load_in_background(self) -> bool:
+        return self.get('model.load_in_background', True)
+    
+    def get_model_export_imgsz(self) -> int:
+        return self.get('model.export_imgsz', 640)
+    
+    def get_model_confidence(self) -> float:
+        return self.get('model.confidence', 0.25)
+    
+    def get_model_iou(self) -> float:
+        return self.get('model.iou', 0.7)
+    
     
     
     def get_uploads_dir(self) -> str:
@@ -64,6 +100,24 @@ class Config:
     def get_history_file(self) -> str:
         return self.get('paths.history_file', 'request_history.json')
     
+    def get_history_db_path(self) -> str:
+        return self.get('paths.history_db', 'static/history.sqlite3')
+    
+    def get_frames_dir(self) -> str:
+        return self.get('paths.frames', 'static/frames')
+    
+    def get_history_backend(self) -> str:
+        return self.get('history.backend', 'sqlite')
+    
+    def get_history_page_size(self) -> int:
+        return self.get('history.page_size', 50)
+    
+    def get_history_max_page_size(self) -> int:
+        return self.get('history.max_page_size', 500)
+    
+    def get_jobs_db_path(self) -> str:
+        return self.get('paths.jobs_db', 'static/jobs.sqlite3')
+    
     def get_video_frame_interval(self) -> int:
         return self.get('video.frame_interval_seconds', 2)
     
@@ -79,5 +133,187 @@ class Config:
     def get_min_long_video_duration(self) -> int:
         return self.get('video.min_long_video_duration', 300)
     
+    def get_video_batch_size(self) -> int:
+        return self.get('video.batch_size', 8)
+    
+    def get_video_sampling_mode(self) -> str:
+        return self.get('video.sampling_mode', 'auto')
+    
+    def get_video_seek_min_gap_frames(self) -> int:
+        return self.get('video.seek_min_gap_frames', 120)
+    
+    def get_job_workers(self) -> int:
+        return self.get('jobs.workers', 1)
+    
+    def get_job_queue_size(self) -> int:
+        return self.get('jobs.queue_size', 16)
+    
+    def get_max_file_size_mb(self) -> int:
+        return self.get('frontend.max_file_size_mb', 50)
+    
+    def get_upload_chunk_size_kb(self) -> int:
+        return self.get('upload.chunk_size_kb', 1024)
+    
+    def get_progressive_extensions(self) -> List[str]:
+        return self.get('upload.progressive_extensions', ['.ts', '.mkv', '.webm'])
+    
+    def get_upload_stall_timeout(self) -> float:
+        return self.get('upload.stall_timeout_seconds', 60)
+    
+    def get_store_original_bytes(self) -> bool:
+        return self.get('images.store_original_bytes', True)
+    
+    def get_image_jpeg_quality(self) -> int:
+        return self.get('images.jpeg_quality', 95)
+    
+    def get_inference_workers(self) -> int:
+        return self.get('inference.workers', 0)
+    
+    def get_inference_queue_size(self) -> int:
+        return self.get('inference.queue_size', 32)
+    
+    def get_inference_submit_timeout(self) -> float:
+        return self.get('inference.submit_timeout_seconds', 5)
+    
+    def get_inference_timeout(self) -> float:
+        return self.get('inference.timeout_seconds', 120)
+    
+    def get_cache_enabled(self) -> bool:
+        return self.get('cache.enabled', True)
+    
+    def get_cache_memory_items(self) -> int:
+        return self.get('cache.memory_items', 256)
+    
+    def get_cache_dir(self) -> str:
+        return self.get('cache.disk_dir', 'static/cache')
+    
+    def get_cache_disk_max_mb(self) -> int:
+        return self.get('cache.disk_max_mb', 512)
+    
+    def get_report_sample_frames(self) -> int:
+        return self.get('reports.sample_frames', 6)
+    
+    def get_report_thumbnail_width(self) -> int:
+        return self.get('reports.thumbnail_width', 400)
+    
+    def get_pdf_cache_dir(self) -> str:
+        return self.get('reports.pdf_cache_dir', 'reports/pdf_cache')
+    
+    def get_report_workers(self) -> int:
+        return self.get('reports.workers', 4)
+    
+    def get_retention_enabled(self) -> bool:
+        return self.get('retention.enabled', False)
+    
+    def get_retention_interval_minutes(self) -> float:
+        return self.get('retention.interval_minutes', 60)
+    
+    def get_retention_grace_minutes(self) -> float:
+        return self.get('retention.grace_minutes', 60)
+    
+    def get_retention_thumbnail_width(self) -> int:
+        return self.get('retention.thumbnail_width', 320)
+    
+    def get_retention_thumbnail_quality(self) -> int:
+        return self.get('retention.thumbnail_quality', 85)
+    
+    def get_retention_shard_by_date(self) -> bool:
+        return self.get('retention.shard_by_date', True)
+    
+    def get_retention_policy(self, directory: str) -> Dict[str, float]:
+        policy = self.get(f'retention.{directory}', {}) or {}
+        return {
+            'compact_after_days': policy.get('compact_after_days', 0),
+            'delete_after_days': policy.get('delete_after_days', 0),
+            'max_size_mb': policy.get('max_size_mb', 0)
+        }
+    
+    def get_metrics_enabled(self) -> bool:
+        return self.get('metrics.enabled', True)
+    
+    def get_profile_sample_rate(self) -> float:
+        return self.get('metrics.profile_sample_rate', 0.0)
+    
+    def get_profile_dir(self) -> str:
+        return self.get('metrics.profile_dir', 'reports/profiles')
+    
+    def get_tiling_enabled(self) -> bool:
+        return self.get('tiling.enabled', False)
+    
+    def get_tiling_min_size(self) -> int:
+        return self.get('tiling.min_size', 2000)
+    
+    def get_tiling_tile_size(self) -> int:
+        return self.get('tiling.tile_size', 640)
+    
+    def get_tiling_overlap(self) -> float:
+        return self.get('tiling.overlap', 0.2)
+    
+    def get_tiling_batch_size(self) -> int:
+        return self.get('tiling.batch_size', 16)
+    
+    def get_tiling_full_image(self) -> bool:
+        return self.get('tiling.full_image', True)
+    
+    def get_output_format(self) -> str:
+        return self.get('output.format', 'jpeg')
+    
+    def get_output_quality(self) -> int:
+        return self.get('output.quality', 95)
+    
+    def get_output_thumbnail_width(self) -> int:
+        return self.get('output.thumbnail_width', 320)
+    
+    def get_output_only_with_detections(self) -> bool:
+        return self.get('output.only_with_detections', False)
+    
+    def get_output_writer_workers(self) -> int:
+        return self.get('output.writer_workers', 2)
+    
+    def get_output_writer_queue_size(self) -> int:
+        return self.get('output.writer_queue_size', 64)
+    
+    def get_batch_max_request_mb(self) -> int:
+        return self.get('batch.max_request_mb', 500)
+    
+    def get_batch_max_files(self) -> int:
+        return self.get('batch.max_files', 500)
+    
+    def get_batch_max_uncompressed_mb(self) -> int:
+        return self.get('batch.max_uncompressed_mb', 2048)
+    
+    def get_batch_decode_workers(self) -> int:
+        return self.get('batch.decode_workers', 4)
+    
+    def get_batch_inference_size(self) -> int:
+        return self.get('batch.inference_batch_size', 8)
+    
+    def get_gating_enabled(self) -> bool:
+        return self.get('gating.enabled', False)
+    
+    def get_gating_threshold(self) -> float:
+        return self.get('gating.threshold', 0.02)
+    
+    def get_gating_width(self) -> int:
+        return self.get('gating.width', 64)
+    
+    def get_tracking_enabled(self) -> bool:
+        return self.get('tracking.enabled', True)
+    
+    def get_tracking_iou_threshold(self) -> float:
+        return self.get('tracking.iou_threshold', 0.3)
+    
+    def get_tracking_max_age(self) -> int:
+        return self.get('tracking.max_age', 2)
+    
+    def get_tracking_skip_inference(self) -> bool:
+        return self.get('tracking.skip_inference', False)
+    
+    def get_tracking_motion_threshold(self) -> float:
+        return self.get('tracking.motion_threshold', 2.0)
+    
+    def get_tracking_max_skip_frames(self) -> int:
+        return self.get('tracking.max_skip_frames', 2)
+    
     def get_cors_origins(self) -> str:
         return self.get('cors.origins', '*')
\ No newline at end of file
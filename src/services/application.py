@@ -1,104 +1,408 @@
 import os
 import datetime
-import json
-import requests
-from typing import Optional, Any, Dict
-
-from ultralytics import YOLO
+import threading
+from typing import TYPE_CHECKING, Optional, Any, Dict, List
 
+from src.services import backends
 from src.config.config import Config
+from src.services.cache import ResultCache
+from src.services.inference_pool import InferencePool
+from src.services.metrics import stage
+from src.services.model_store import ModelArtifactStore, file_sha256
+from src.services.writer import OUTPUT_FORMATS, ImageWriter
+from src.services.history import HistoryStore, create_history_store, migrate_json_history
+from src.utils.helpers import dated_dir
+
+if TYPE_CHECKING:
+    from ultralytics import YOLO
+
+
+class ModelNotReady(RuntimeError):
+    pass
 
 class ApplicationContext:
     
     def __init__(self, config: Config):
         self.config = config
-        self.model: Optional[YOLO] = None
-        self._history = None
+        self.model: Optional['YOLO'] = None
+        self.inference_pool: Optional[InferencePool] = None
+        self._model_artifact: Optional[str] = None
+        self._history_store: Optional[HistoryStore] = None
+        self._init_lock = threading.Lock()
+        self._result_cache: Optional[ResultCache] = None
+        self._image_writer: Optional[ImageWriter] = None
+        self._ready = threading.Event()
+        # Set once initialization has finished, successfully or not
+        self._settled = threading.Event()
+        self._init_error: Optional[str] = None
+        self._model_path: Optional[str] = None
     
-    def _download_model(self):
+    def _download_model(self) -> str:
         """
-        Download the model from Yandex Disk if it doesn't exist locally.
+        Return the path of verified model weights, downloading them into the
+        model cache if ``model.path`` does not hold them.
         """
         model_path = self.config.get_model_path()
         yandex_disk_url = self.config.get_yandex_disk_url()
-        
-        if not yandex_disk_url:
-            raise ValueError("Yandex Disk URL is not configured")
+        sha256 = self.config.get_model_sha256()
         
         if os.path.exists(model_path):
-            print(f"Model already exists at {model_path}")
-            return
-        
-        print(f"Downloading model from {yandex_disk_url} to {model_path}")
+            if not sha256 or file_sha256(model_path) == sha256.lower():
+                print(f"Model already exists at {model_path}")
+                return model_path
+            print(f"Model at {model_path} does not match the configured checksum, using the model cache")
         
-        os.makedirs(os.path.dirname(model_path), exist_ok=True)
+        if not yandex_disk_url:
+            raise ValueError("Yandex Disk URL is not configured")
         
-        try:
-            # Download the file
-            response = requests.get(yandex_disk_url, stream=True)
-            response.raise_for_status()
-            
-            with open(model_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
-            
-            print(f"Model downloaded successfully to {model_path}")
-            
-        except requests.RequestException as e:
-            raise Exception(f"Failed to download model from Yandex Disk: {e}")
+        store = ModelArtifactStore(
+            self.config.get_model_cache_dir(),
+            timeout=self.config.get_model_download_timeout(),
+            retries=self.config.get_model_download_retries(),
+            chunk_size=self.config.get_model_download_chunk_kb() * 1024
+        )
+        return store.fetch(
+            yandex_disk_url,
+            os.path.basename(model_path),
+            sha256=sha256,
+            version=self.config.get_model_version()
+        )
 
     def initialize(self):
         """
-        Initialize the application context, including downloading the model if needed.
+        Initialize the application context, including downloading the model if
+        needed and running a warm-up inference.
         """
         # Download model if it doesn't exist
-        self._download_model()
-        self.model = YOLO(self.config.get_model_path())
+        self._model_path = self._download_model()
+        self._model_artifact = backends.resolve_model_artifact(
+            self.get_model_path(),
+            self.config.get_model_backend(),
+            imgsz=self.config.get_model_export_imgsz()
+        )
+        
+        self._start_inference_pool()
+        if self.inference_pool is not None:
+            self.inference_pool.load(self.get_model_artifact(), warmup_imgsz=self._get_warmup_imgsz())
+            self.model = self.inference_pool
+        else:
+            self.model = self.load_model()
+        self._ready.set()
+        self._settled.set()
+    
+    def _start_inference_pool(self) -> None:
+        # Pool workers are forked, so this must run on the main thread before
+        # any other thread starts (see InferencePool.start)
+        workers = self.config.get_inference_workers()
+        if workers > 0 and self.inference_pool is None:
+            pool = InferencePool(
+                workers=workers,
+                queue_size=self.config.get_inference_queue_size(),
+                submit_timeout=self.config.get_inference_submit_timeout(),
+                timeout=self.config.get_inference_timeout()
+            )
+            pool.start()
+            self.inference_pool = pool
+    
+    def start_background_initialize(self) -> threading.Thread:
+        """
+        Run ``initialize()`` in a background thread, so the web server answers
+        (and reports readiness) while the model downloads and loads. Call it
+        before starting other threads: the inference pool workers are forked
+        first, from the calling thread.
+        """
+        self._start_inference_pool()
+        
+        def run():
+            try:
+                self.initialize()
+            except Exception as e:
+                self._init_error = str(e)
+                print(f"Model initialization failed: {e}")
+            finally:
+                self._settled.set()
+        
+        thread = threading.Thread(target=run, name='model-init', daemon=True)
+        thread.start()
+        return thread
+    
+    def is_ready(self) -> bool:
+        return self._ready.is_set()
+    
+    def wait_until_ready(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait for the model to load. Returns False on timeout and, without
+        waiting any longer, once background initialization has failed.
+        """
+        if self._ready.is_set():
+            return True
+        self._settled.wait(timeout)
+        return self._ready.is_set()
     
-    def get_model(self) -> YOLO:
+    def get_status(self) -> Dict[str, Any]:
+        if self._ready.is_set():
+            return {'status': 'ready'}
+        if self._init_error is not None:
+            return {'status': 'failed', 'error': self._init_error}
+        return {'status': 'loading'}
+    
+    def _get_warmup_imgsz(self) -> int:
+        return self.config.get_model_export_imgsz() if self.config.get_model_warmup() else 0
+    
+    def load_model(self) -> 'YOLO':
+        """
+        Load a fresh, warmed-up model instance, e.g. for a worker that needs
+        its own copy. With an inference pool the shared pool is returned instead.
+        """
+        if self.inference_pool is not None:
+            return self.inference_pool
+        model = backends.load_model(self.get_model_artifact())
+        warmup_imgsz = self._get_warmup_imgsz()
+        if warmup_imgsz:
+            backends.warm_up(model, warmup_imgsz, **self.get_inference_params())
+        return model
+    
+    def get_model_path(self) -> str:
+        """
+        Path of the ``.pt`` weights: ``model.path``, or the cached download
+        when that file is missing or fails the checksum.
+        """
+        if self._model_path is None:
+            return self.config.get_model_path()
+        return self._model_path
+    
+    def get_model_artifact(self) -> str:
+        """
+        Path of the weights for the configured backend (``.pt``, ``.onnx`` or
+        an OpenVINO model directory).
+        """
+        if self._model_artifact is None:
+            return self.get_model_path()
+        return self._model_artifact
+    
+    def get_model(self) -> 'YOLO':
         if self.model is None:
-            raise RuntimeError("Model not initialized. Call initialize() first.")
+            raise ModelNotReady(self._init_error or "Model is still loading, try again shortly")
         return self.model
     
+    def get_inference_params(self) -> Dict[str, Any]:
+        return {
+            'conf': self.config.get_model_confidence(),
+            'iou': self.config.get_model_iou()
+        }
+    
+    def get_model_identity(self) -> str:
+        """
+        Identify the loaded weights and thresholds, so cached results are not
+        reused after either changes.
+        """
+        model_path = self.get_model_path()
+        try:
+            stat = os.stat(model_path)
+            weights = f'{os.path.abspath(model_path)}:{stat.st_size}:{int(stat.st_mtime)}'
+        except OSError:
+            weights = model_path
+        params = self.get_inference_params()
+        backend = self.config.get_model_backend()
+        return f"{weights}|backend={backend}|conf={params['conf']}|iou={params['iou']}"
+    
+    def get_result_cache(self) -> Optional[ResultCache]:
+        if not self.config.get_cache_enabled():
+            return None
+        if self._result_cache is None:
+            with self._init_lock:
+                if self._result_cache is None:
+                    self._result_cache = ResultCache(
+                        self.config.get_cache_dir(),
+                        memory_items=self.config.get_cache_memory_items(),
+                        disk_max_bytes=self.config.get_cache_disk_max_mb() * 1024 * 1024
+                    )
+        return self._result_cache
+    
+    def get_image_writer(self) -> ImageWriter:
+        if self._image_writer is None:
+            with self._init_lock:
+                if self._image_writer is None:
+                    writer = ImageWriter(
+                        workers=self.config.get_output_writer_workers(),
+                        queue_size=self.config.get_output_writer_queue_size()
+                    )
+                    writer.start()
+                    self._image_writer = writer
+        return self._image_writer
+    
     def get_history_file(self) -> str:
         return self.config.get_history_file()
     
-    def get_history(self) -> Dict[str, Any]:
-        if self._history is None:
-            history_file = self.get_history_file()
-            if os.path.exists(history_file):
-                try:
-                    with open(history_file, 'r', encoding='utf-8') as f:
-                        self._history = json.load(f)
-                except (json.JSONDecodeError, IOError) as e:
-                    print(f"Error reading history file {history_file}: {e}")
-                    self._history = {"requests": []}
-            else:
-                self._history = {"requests": []}
-        return self._history
-    
-    def save_history(self, history: Dict[str, Any]) -> None:
-        history_file = self.get_history_file()
-        try:
-            with open(history_file, 'w', encoding='utf-8') as f:
-                json.dump(history, f, ensure_ascii=False, indent=2)
-            self._history = history
-        except IOError as e:
-            print(f"Error saving history file {history_file}: {e}")
-            raise
+    def get_history_store(self) -> HistoryStore:
+        """
+        Open the history backend, importing the legacy JSON history file on first use.
+        """
+        if self._history_store is None:
+            with self._init_lock:
+                if self._history_store is None:
+                    store = create_history_store(
+                        self.config.get_history_backend(),
+                        self.config.get_history_db_path(),
+                        self.config.get_frames_dir()
+                    )
+                    migrate_json_history(store, self.get_history_file())
+                    self._history_store = store
+        return self._history_store
+    
+    def get_history(self, entry_type: Optional[str] = None, start: Optional[str] = None,
+                    end: Optional[str] = None) -> List[Dict[str, Any]]:
+        return list(self.get_history_store().query(entry_type=entry_type, start=start, end=end))
+    
+    def get_history_entry(self, entry_id: int) -> Optional[Dict[str, Any]]:
+        return self.get_history_store().get(entry_id)
+    
+    def add_history_entry(self, entry: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Append an entry to the history and return it with its assigned id.
+        """
+        with stage('history_write'):
+            return self.get_history_store().append(entry)
+    
+    def add_history_entries(self, entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Append several entries in one transaction and return them with their ids.
+        """
+        with stage('history_write'):
+            return self.get_history_store().append_many(entries)
+    
+    def _get_dated_dir(self, base: str) -> str:
+        if not self.config.get_retention_shard_by_date():
+            return base
+        # Created on every call: retention may have removed an emptied directory
+        path = dated_dir(base)
+        os.makedirs(path, exist_ok=True)
+        return path
     
     def get_uploads_dir(self) -> str:
-        return self.config.get_uploads_dir()
+        """
+        Directory for new uploads: today's ``YYYY/MM/DD`` subdirectory of
+        ``paths.uploads`` when ``retention.shard_by_date`` is on. The same
+        goes for the results and reports directories.
+        """
+        return self._get_dated_dir(self.config.get_uploads_dir())
     
     def get_results_dir(self) -> str:
-        return self.config.get_results_dir()
+        return self._get_dated_dir(self.config.get_results_dir())
     
     def get_reports_dir(self) -> str:
-        return self.config.get_reports_dir()
+        return self._get_dated_dir(self.config.get_reports_dir())
+    
+    
+    def get_jobs_db_path(self) -> str:
+        return self.config.get_jobs_db_path()
+    
+    def get_store_original_bytes(self) -> bool:
+        return self.config.get_store_original_bytes()
+    
+    def get_image_jpeg_quality(self) -> int:
+        return self.config.get_image_jpeg_quality()
+    
+    def get_tiling_params(self) -> Optional[Dict[str, Any]]:
+        """
+        Tile settings for large images, or ``None`` when tiling is off.
+        """
+        if not self.config.get_tiling_enabled():
+            return None
+        return {
+            'min_size': self.config.get_tiling_min_size(),
+            'tile_size': self.config.get_tiling_tile_size(),
+            'overlap': min(max(float(self.config.get_tiling_overlap()), 0.0), 0.9),
+            'batch_size': max(1, int(self.config.get_tiling_batch_size())),
+            'full_image': bool(self.config.get_tiling_full_image())
+        }
+    
+    def get_output_format(self) -> str:
+        output_format = self.config.get_output_format()
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unknown output format: {output_format}")
+        return output_format
+    
+    def get_output_quality(self) -> int:
+        return self.config.get_output_quality()
+    
+    def get_output_thumbnail_width(self) -> int:
+        return self.config.get_output_thumbnail_width()
+    
+    def get_output_only_with_detections(self) -> bool:
+        return self.config.get_output_only_with_detections()
+    
+    def get_batch_decode_workers(self) -> int:
+        return self.config.get_batch_decode_workers()
     
+    def get_batch_inference_size(self) -> int:
+        return max(1, self.config.get_batch_inference_size())
+    
+    def get_report_sample_frames(self) -> int:
+        return self.config.get_report_sample_frames()
+    
+    def get_report_thumbnail_width(self) -> int:
+        return self.config.get_report_thumbnail_width()
+    
+    def get_pdf_cache_dir(self) -> str:
+        return self.config.get_pdf_cache_dir()
+    
+    def get_report_workers(self) -> int:
+        return self.config.get_report_workers()
+    
+    def get_gating_enabled(self) -> bool:
+        return self.config.get_gating_enabled()
+    
+    def get_gating_threshold(self) -> float:
+        return self.config.get_gating_threshold()
+    
+    def get_gating_width(self) -> int:
+        return self.config.get_gating_width()
+    
+    def get_tracking_enabled(self) -> bool:
+        return self.config.get_tracking_enabled()
+    
+    def get_tracking_iou_threshold(self) -> float:
+        return self.config.get_tracking_iou_threshold()
+    
+    def get_tracking_max_age(self) -> int:
+        return self.config.get_tracking_max_age()
+    
+    def get_tracking_skip_inference(self) -> bool:
+        return self.config.get_tracking_skip_inference()
+    
+    def get_tracking_motion_threshold(self) -> float:
+        return self.config.get_tracking_motion_threshold()
+    
+    def get_tracking_max_skip_frames(self) -> int:
+        return self.config.get_tracking_max_skip_frames()
     
     def get_video_frame_interval(self) -> int:
         return self.config.get_video_frame_interval()
     
+    def get_video_base_frame_interval(self) -> float:
+        return self.config.get_video_base_frame_interval()
+    
+    def get_video_min_frame_interval(self) -> float:
+        return self.config.get_video_min_frame_interval()
+    
+    def get_max_short_video_duration(self) -> int:
+        return self.config.get_max_short_video_duration()
+    
+    def get_min_long_video_duration(self) -> int:
+        return self.config.get_min_long_video_duration()
+    
+    def get_video_sampling_mode(self) -> str:
+        return self.config.get_video_sampling_mode()
+    
+    def get_video_seek_min_gap_frames(self) -> int:
+        return self.config.get_video_seek_min_gap_frames()
+    
+    def get_upload_stall_timeout(self) -> float:
+        return self.config.get_upload_stall_timeout()
+    
+    def get_video_batch_size(self) -> int:
+        return max(1, int(self.config.get_video_batch_size()))
+    
     def get_timestamp(self) -> str:
         return datetime.datetime.now().strftime('%Y%m%d_%H%M%S_%f')
\ No newline at end of file
@@ -0,0 +1,71 @@
+import os
+
+MODEL_BACKENDS = ('torch', 'onnx', 'openvino')
+
+
+def get_backend_artifact_path(model_path: str, backend: str) -> str:
+    """
+    Where the exported artifact of ``backend`` lives, next to the weights.
+
+    These match the names ultralytics uses when exporting, so an export and a
+    later lookup agree.
+    """
+    stem, _ = os.path.splitext(model_path)
+    if backend == 'onnx':
+        return f'{stem}.onnx'
+    if backend == 'openvino':
+        return f'{stem}_openvino_model'
+    return model_path
+
+
+def _is_fresh(artifact_path: str, model_path: str) -> bool:
+    if not os.path.exists(artifact_path):
+        return False
+    if not os.path.exists(model_path):
+        return True
+    return os.path.getmtime(artifact_path) >= os.path.getmtime(model_path)
+
+
+def resolve_model_artifact(model_path: str, backend: str, imgsz: int = 640) -> str:
+    """
+    Return the file the model should be loaded from for ``backend``.
+
+    For ``onnx`` and ``openvino`` the weights are exported once and the
+    artifact is reused until the weights change.
+    """
+    if backend not in MODEL_BACKENDS:
+        raise ValueError(f"Unknown model backend: {backend}")
+
+    artifact_path = get_backend_artifact_path(model_path, backend)
+    if backend == 'torch' or _is_fresh(artifact_path, model_path):
+        return artifact_path
+
+    from ultralytics import YOLO
+
+    print(f"Exporting {model_path} for the {backend} backend")
+    exported_path = YOLO(model_path).export(format=backend, imgsz=imgsz)
+    if os.path.abspath(str(exported_path)) != os.path.abspath(artifact_path):
+        os.replace(str(exported_path), artifact_path)
+    print(f"Exported {backend} model to {artifact_path}")
+    return artifact_path
+
+
+def load_model(artifact_path: str):
+    """
+    Load a model from any backend artifact. Exported artifacts expose the same
+    call interface and results as the torch model.
+    """
+    from ultralytics import YOLO
+
+    return YOLO(artifact_path, task='detect')
+
+
+def warm_up(model, imgsz: int = 640, **kwargs) -> None:
+    """
+    Run one inference on a blank image, so lazy setup in the backend (memory
+    allocation, graph optimization, device context) is not paid by the first
+    request.
+    """
+    import numpy as np
+
+    model(np.zeros((imgsz, imgsz, 3), dtype=np.uint8), verbose=False, **kwargs)
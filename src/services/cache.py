@@ -0,0 +1,144 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+
+class ResultCache:
+    """
+    Two-tier cache of image detection results keyed by content hash.
+
+    The memory tier is an LRU of at most ``memory_items`` entries. The disk
+    tier keeps ``<key>.json`` (detections) and ``<key>.jpg`` (result image)
+    pairs in ``disk_dir`` and evicts the least recently used pairs once their
+    total size exceeds ``disk_max_bytes``.
+    """
+
+    def __init__(self, disk_dir: str, memory_items: int = 256, disk_max_bytes: int = 512 * 1024 * 1024):
+        self.disk_dir = disk_dir
+        self.memory_items = max(0, memory_items)
+        self.disk_max_bytes = max(0, disk_max_bytes)
+        self._memory: OrderedDict = OrderedDict()
+        self._disk_index: OrderedDict = OrderedDict()
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        os.makedirs(disk_dir, exist_ok=True)
+        self._load_disk_index()
+
+    @staticmethod
+    def make_key(data: bytes, model_identity: str) -> str:
+        digest = hashlib.sha256(data)
+        digest.update(b'\0')
+        digest.update(model_identity.encode('utf-8'))
+        return digest.hexdigest()
+
+    def _paths(self, key: str):
+        return (os.path.join(self.disk_dir, f'{key}.json'),
+                os.path.join(self.disk_dir, f'{key}.jpg'))
+
+    def _load_disk_index(self) -> None:
+        entries = []
+        for name in os.listdir(self.disk_dir):
+            if not name.endswith('.json'):
+                continue
+            key = name[:-len('.json')]
+            meta_path, image_path = self._paths(key)
+            try:
+                size = os.path.getsize(meta_path) + os.path.getsize(image_path)
+                entries.append((os.path.getmtime(meta_path), key, size))
+            except OSError:
+                continue
+        for _, key, size in sorted(entries):
+            self._disk_index[key] = size
+            self._disk_bytes += size
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return self._memory[key]
+
+            if key in self._disk_index:
+                meta_path, image_path = self._paths(key)
+                try:
+                    with open(meta_path, 'r', encoding='utf-8') as f:
+                        detections = json.load(f)
+                    with open(image_path, 'rb') as f:
+                        result_image = f.read()
+                    os.utime(meta_path)
+                except (OSError, json.JSONDecodeError):
+                    self._remove_disk_entry(key)
+                else:
+                    self._disk_index.move_to_end(key)
+                    value = {'detections': detections, 'result_image': result_image}
+                    self._remember(key, value)
+                    self.disk_hits += 1
+                    return value
+
+            self.misses += 1
+            return None
+
+    def put(self, key: str, detections: List[Dict[str, Any]], result_image: bytes) -> None:
+        value = {'detections': detections, 'result_image': result_image}
+        with self._lock:
+            self._remember(key, value)
+            if self.disk_max_bytes <= 0 or key in self._disk_index:
+                return
+
+            meta_path, image_path = self._paths(key)
+            try:
+                with open(image_path, 'wb') as f:
+                    f.write(result_image)
+                # The metadata file is written last, so only complete pairs are indexed
+                with open(meta_path, 'w', encoding='utf-8') as f:
+                    json.dump(detections, f, ensure_ascii=False)
+            except OSError as e:
+                print(f"Error writing result cache entry {key}: {e}")
+                return
+
+            size = os.path.getsize(meta_path) + os.path.getsize(image_path)
+            self._disk_index[key] = size
+            self._disk_bytes += size
+            while self._disk_bytes > self.disk_max_bytes and self._disk_index:
+                oldest_key = next(iter(self._disk_index))
+                self._remove_disk_entry(oldest_key)
+                self.evictions += 1
+
+    def _remember(self, key: str, value: Dict[str, Any]) -> None:
+        if self.memory_items <= 0:
+            return
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def _remove_disk_entry(self, key: str) -> None:
+        self._disk_bytes -= self._disk_index.pop(key, 0)
+        for path in self._paths(key):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'memory_items': len(self._memory),
+                'disk_items': len(self._disk_index),
+                'disk_bytes': self._disk_bytes
+            }
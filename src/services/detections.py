@@ -0,0 +1,60 @@
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Tuple
+
+import numpy as np
+
+
+def to_numpy(values) -> np.ndarray:
+    # Model results hold tensors, inference pool results plain arrays
+    if hasattr(values, 'cpu'):
+        values = values.cpu().numpy()
+    return np.asarray(values)
+
+
+def extract_boxes(results) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    ``xyxy`` (N x 4), ``conf`` and integer ``cls`` arrays of all boxes in
+    ``results``, moved off the model's tensors once per result instead of
+    once per box.
+    """
+    boxes, scores, classes = [], [], []
+    for result in results:
+        boxes.append(to_numpy(result.boxes.xyxy).reshape(-1, 4))
+        scores.append(to_numpy(result.boxes.conf).reshape(-1))
+        classes.append(to_numpy(result.boxes.cls).reshape(-1))
+    if not boxes:
+        return np.zeros((0, 4), dtype=np.float32), np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.int64)
+    xyxy = np.concatenate(boxes).astype(np.float32, copy=False)
+    conf = np.concatenate(scores).astype(np.float32, copy=False)
+    cls = np.concatenate(classes).astype(np.int64)
+    return xyxy, conf, cls
+
+
+def to_detections(names, xyxy: np.ndarray, conf: np.ndarray, cls: np.ndarray) -> List[Dict[str, Any]]:
+    """
+    The ``{'class', 'confidence', 'bbox'}`` dicts stored in the history,
+    built from whole-array ``tolist`` calls.
+    """
+    labels = [names[c] for c in cls.tolist()]
+    return [
+        {'class': label, 'confidence': score, 'bbox': bbox}
+        for label, score, bbox in zip(labels, conf.tolist(), xyxy.tolist())
+    ]
+
+
+def count_classes(names, cls: np.ndarray) -> Dict[str, int]:
+    """
+    Detections per class name, counted with ``np.bincount``.
+    """
+    if len(cls) == 0:
+        return {}
+    counts = np.bincount(cls)
+    return {names[c]: int(counts[c]) for c in np.flatnonzero(counts).tolist()}
+
+
+def summarize_detections(detections: Iterable[Dict[str, Any]]) -> Dict[str, int]:
+    """
+    Detections per class name for stored detection dicts, which have no
+    class ids to count with.
+    """
+    return dict(Counter(d['class'] for d in detections))
@@ -0,0 +1,208 @@
+import os
+import shutil
+import uuid
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from src.utils.helpers import dated_dir
+
+PROPAGATED = 1
+REUSED = 2
+
+# Per-frame columns, then per-detection columns indexed through ``offsets``
+FRAME_COLUMNS = ('frame_number', 'timestamp', 'result_image', 'thumbnail', 'flags', 'offsets')
+DETECTION_COLUMNS = ('class_id', 'confidence', 'bbox', 'track_id')
+
+
+def _strings(values: List[str]) -> np.ndarray:
+    # Fixed-width unicode keeps string columns memory-mappable
+    return np.array(values, dtype=f'U{max([1] + [len(v) for v in values])}')
+
+
+class FrameColumns:
+    """
+    Per-frame detections of one video as columns: frame numbers, timestamps
+    and image paths per frame, class ids, confidences, boxes and track ids per
+    detection, with ``offsets[i]:offsets[i + 1]`` selecting the detections of
+    frame ``i``.
+
+    On disk each column is a ``.npy`` file in one directory per video and is
+    memory-mapped on open, so reading a few columns of a long video does not
+    load the rest.
+    """
+
+    def __init__(self, columns: Dict[str, np.ndarray], class_names: List[str]):
+        self.columns = columns
+        self.class_names = class_names
+
+    def __len__(self) -> int:
+        return len(self.columns['frame_number'])
+
+    @classmethod
+    def from_frame_results(cls, frame_results: List[Dict[str, Any]]) -> 'FrameColumns':
+        class_ids: Dict[str, int] = {}
+        detections = [d for frame in frame_results for d in frame['detections']]
+        counts = [len(frame['detections']) for frame in frame_results]
+        flags = [
+            (PROPAGATED if frame.get('propagated') else 0) | (REUSED if frame.get('reused') else 0)
+            for frame in frame_results
+        ]
+        columns = {
+            'frame_number': np.array([frame['frame_number'] for frame in frame_results], dtype=np.int64),
+            'timestamp': _strings([frame['timestamp'] for frame in frame_results]),
+            'result_image': _strings([frame.get('result_image') or '' for frame in frame_results]),
+            'thumbnail': _strings([frame.get('thumbnail') or '' for frame in frame_results]),
+            'flags': np.array(flags, dtype=np.uint8),
+            'offsets': np.concatenate([[0], np.cumsum(counts, dtype=np.int64)]).astype(np.int64),
+            'class_id': np.array([class_ids.setdefault(d['class'], len(class_ids)) for d in detections],
+                                 dtype=np.int32),
+            'confidence': np.array([d['confidence'] for d in detections], dtype=np.float32),
+            'bbox': np.array([d['bbox'] for d in detections], dtype=np.float32).reshape(-1, 4),
+            'track_id': np.array([d.get('track_id', -1) for d in detections], dtype=np.int64)
+        }
+        return cls(columns, list(class_ids))
+
+    @classmethod
+    def open(cls, path: str) -> 'FrameColumns':
+        columns = {
+            name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r')
+            for name in FRAME_COLUMNS + DETECTION_COLUMNS
+        }
+        class_names = np.load(os.path.join(path, 'class_names.npy')).tolist()
+        return cls(columns, class_names)
+
+    def save(self, path: str) -> None:
+        """
+        Write the columns to the directory ``path``. They go to a temporary
+        directory first that is renamed into place, so readers never see a
+        partial set.
+        """
+        tmp_path = f'{path}.tmp'
+        os.makedirs(tmp_path, exist_ok=True)
+        try:
+            for name in FRAME_COLUMNS + DETECTION_COLUMNS:
+                np.save(os.path.join(tmp_path, f'{name}.npy'), np.ascontiguousarray(self.columns[name]))
+            np.save(os.path.join(tmp_path, 'class_names.npy'), _strings(self.class_names))
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                shutil.rmtree(tmp_path, ignore_errors=True)
+
+    @property
+    def frame_numbers(self) -> np.ndarray:
+        return self.columns['frame_number']
+
+    @property
+    def detection_counts(self) -> np.ndarray:
+        return np.diff(self.columns['offsets'])
+
+    def class_counts(self) -> Dict[str, int]:
+        counts = np.bincount(self.columns['class_id'], minlength=len(self.class_names))
+        return {self.class_names[i]: int(counts[i]) for i in np.flatnonzero(counts).tolist()}
+
+    def to_frame_results(self, start: int = 0, stop: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Rebuild the ``frame_results`` dicts of frames ``start:stop``.
+        """
+        stop = len(self) if stop is None else min(stop, len(self))
+        if start >= stop:
+            return []
+        offsets = self.columns['offsets'][start:stop + 1].tolist()
+        first, last = offsets[0], offsets[-1]
+        # One tolist per column for the whole range
+        classes = [self.class_names[i] for i in self.columns['class_id'][first:last].tolist()]
+        confidences = self.columns['confidence'][first:last].tolist()
+        boxes = self.columns['bbox'][first:last].tolist()
+        track_ids = self.columns['track_id'][first:last].tolist()
+
+        detections = []
+        for i in range(last - first):
+            detection = {'class': classes[i], 'confidence': confidences[i], 'bbox': boxes[i]}
+            if track_ids[i] >= 0:
+                detection['track_id'] = track_ids[i]
+            detections.append(detection)
+
+        frame_results = []
+        frames = zip(
+            self.columns['frame_number'][start:stop].tolist(),
+            self.columns['timestamp'][start:stop].tolist(),
+            self.columns['result_image'][start:stop].tolist(),
+            self.columns['thumbnail'][start:stop].tolist(),
+            self.columns['flags'][start:stop].tolist()
+        )
+        for i, (frame_number, timestamp, result_image, thumbnail, flags) in enumerate(frames):
+            frame_result = {
+                'frame_number': frame_number,
+                'timestamp': timestamp,
+                'result_image': result_image or None
+            }
+            if flags & PROPAGATED:
+                frame_result['propagated'] = True
+            elif flags & REUSED:
+                frame_result['reused'] = True
+            if thumbnail:
+                frame_result['thumbnail'] = thumbnail
+            frame_result['detections'] = detections[offsets[i] - first:offsets[i + 1] - first]
+            frame_results.append(frame_result)
+        return frame_results
+
+
+def save_frame_results(frames_dir: str, frame_results: List[Dict[str, Any]]) -> str:
+    """
+    Store ``frame_results`` as columns in a new directory under the dated
+    subdirectory of ``frames_dir`` and return its path.
+    """
+    frames_dir = dated_dir(frames_dir)
+    os.makedirs(frames_dir, exist_ok=True)
+    path = os.path.join(frames_dir, uuid.uuid4().hex)
+    FrameColumns.from_frame_results(frame_results).save(path)
+    return path
+
+
+def update_frame_paths(path: str, mapping: Dict[str, Optional[str]]) -> bool:
+    """
+    Rewrite the ``result_image`` and ``thumbnail`` columns of the frame store
+    at ``path``, replacing every path found in ``mapping`` (keys normalised
+    with ``os.path.normpath``) by its new path, or clearing it for None.
+    Returns whether anything changed.
+    """
+    changed = False
+    for name in ('result_image', 'thumbnail'):
+        column_path = os.path.join(path, f'{name}.npy')
+        values = np.load(column_path).tolist()
+        updated = []
+        for value in values:
+            new_value = mapping.get(os.path.normpath(value), value) if value else value
+            updated.append(new_value or '')
+        if updated == values:
+            continue
+        # Each column is replaced whole, so readers see either version
+        tmp_path = f'{column_path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.save(f, _strings(updated))
+        os.replace(tmp_path, column_path)
+        changed = True
+    return changed
+
+
+def open_frame_columns(entry: Dict[str, Any]) -> FrameColumns:
+    """
+    Columns of a video entry: memory-mapped from its frame store, or built
+    from inline ``frame_results`` of entries written before the columns.
+    """
+    if entry.get('frame_store'):
+        return FrameColumns.open(entry['frame_store'])
+    return FrameColumns.from_frame_results(entry.get('frame_results', []))
+
+
+def expand_frame_results(entry: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    The entry in its JSON shape, with ``frame_results`` rebuilt from the
+    frame store.
+    """
+    if not entry.get('frame_store'):
+        return entry
+    expanded = {key: value for key, value in entry.items() if key not in ('frame_store', 'frames_processed')}
+    expanded['frame_results'] = FrameColumns.open(entry['frame_store']).to_frame_results()
+    return expanded
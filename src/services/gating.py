@@ -0,0 +1,60 @@
+from typing import Optional
+
+import cv2
+import numpy as np
+
+
+class SceneChangeGate:
+    """
+    Cheap static-frame detector based on downscaled frame differencing.
+
+    Frames are compared with the reference frame (the last frame that got
+    fresh detections) on a grayscale thumbnail split into ``cell``-pixel
+    cells. A frame is static when the mean absolute difference of every
+    cell is below ``threshold``, expressed as a fraction of the full 0-255
+    range. Taking the largest cell rather than the whole frame catches a
+    small object moving over a still background, and comparing against the
+    reference rather than the previous frame keeps slow drift from going
+    unnoticed.
+    """
+
+    def __init__(self, threshold: float = 0.02, width: int = 64, cell: int = 8):
+        self.threshold = threshold
+        self.width = width
+        self.cell = cell
+        self._reference: Optional[np.ndarray] = None
+        self._last: Optional[np.ndarray] = None
+        self.reused_frames = 0
+
+    def _thumbnail(self, frame: np.ndarray) -> np.ndarray:
+        height = max(1, int(round(frame.shape[0] * self.width / frame.shape[1])))
+        small = cv2.resize(frame, (self.width, height), interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+    def _change(self, small: np.ndarray) -> float:
+        diff = cv2.absdiff(small, self._reference).astype(np.float32)
+        height, width = diff.shape
+        cells = cv2.resize(diff, (max(1, width // self.cell), max(1, height // self.cell)),
+                           interpolation=cv2.INTER_AREA)
+        return float(cells.max()) / 255.0
+
+    def check(self, frame: np.ndarray) -> bool:
+        """
+        Return ``True`` when the previous detections can be reused for this
+        frame. Call ``update_reference()`` if the frame then gets fresh
+        detections.
+        """
+        small = self._thumbnail(frame)
+        self._last = small
+        if self._reference is not None and self._reference.shape == small.shape:
+            if self._change(small) < self.threshold:
+                self.reused_frames += 1
+                return True
+        return False
+
+    def update_reference(self) -> None:
+        """
+        Make the frame last passed to ``check()`` the reference.
+        """
+        if self._last is not None:
+            self._reference = self._last
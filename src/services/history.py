@@ -0,0 +1,378 @@
+import datetime
+import json
+import os
+import shutil
+import sqlite3
+import threading
+from typing import Any, Dict, Iterator, List, Optional
+
+from src.services.frame_store import save_frame_results
+from src.services.statistics import CONFIDENCE_BINS, entry_statistics
+
+
+class HistoryStore:
+    """
+    Interface of a request history backend.
+
+    Entries are plain dicts; the store assigns the ``id`` on append.
+    """
+
+    def append(self, entry: Dict[str, Any]) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def append_many(self, entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return [self.append(entry) for entry in entries]
+
+    def get(self, entry_id: int) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def query(self, entry_type: Optional[str] = None, start: Optional[str] = None,
+              end: Optional[str] = None, after_id: Optional[int] = None,
+              limit: Optional[int] = None, descending: bool = False) -> Iterator[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def import_entries(self, entries: List[Dict[str, Any]]) -> int:
+        """
+        Insert entries keeping their existing ids. Used for migrations.
+        Entries whose id is already taken are skipped, so stored rows are
+        never overwritten. Returns the number of entries inserted.
+        """
+        raise NotImplementedError
+
+    def update_many(self, entries: List[Dict[str, Any]]) -> int:
+        """
+        Replace the stored data of existing entries, matched by id, in one
+        transaction. Aggregates are left alone, so only fields they do not
+        count (such as file paths) may change.
+        """
+        raise NotImplementedError
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """
+        Report statistics from the aggregates maintained at write time.
+        """
+        raise NotImplementedError
+
+    def rebuild_statistics(self) -> Dict[str, Any]:
+        """
+        Recompute the aggregates from the stored entries.
+        """
+        raise NotImplementedError
+
+
+class SQLiteHistoryStore(HistoryStore):
+    """
+    History kept in a SQLite database in WAL mode.
+
+    Each entry is one row, so appends and lookups by id do not depend on the
+    size of the history, and readers never block the writer.
+
+    With ``frames_dir`` set, the ``frame_results`` of video entries are kept
+    as columns in a frame store directory (see ``FrameColumns``) and the row
+    only holds its path in ``frame_store`` and ``frames_processed``.
+    """
+
+    def __init__(self, db_path: str, frames_dir: Optional[str] = None):
+        self.db_path = db_path
+        self.frames_dir = frames_dir
+        self._local = threading.local()
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+
+        conn = self._connection()
+        conn.execute('PRAGMA journal_mode=WAL')
+        with conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS history ('
+                ' id INTEGER PRIMARY KEY AUTOINCREMENT,'
+                ' timestamp TEXT NOT NULL,'
+                ' type TEXT NOT NULL,'
+                ' data TEXT NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_history_timestamp ON history (timestamp)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_history_type ON history (type, id)')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS stats_daily ('
+                ' day TEXT PRIMARY KEY,'
+                ' requests INTEGER NOT NULL,'
+                ' detections INTEGER NOT NULL)'
+            )
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS stats_classes ('
+                ' day TEXT NOT NULL,'
+                ' class TEXT NOT NULL,'
+                ' count INTEGER NOT NULL,'
+                ' PRIMARY KEY (day, class))'
+            )
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS stats_confidence ('
+                ' day TEXT NOT NULL,'
+                ' bucket INTEGER NOT NULL,'
+                ' count INTEGER NOT NULL,'
+                ' PRIMARY KEY (day, bucket))'
+            )
+
+        # Databases created before the aggregates existed get them filled once
+        has_history = conn.execute('SELECT 1 FROM history LIMIT 1').fetchone()
+        has_stats = conn.execute('SELECT 1 FROM stats_daily LIMIT 1').fetchone()
+        if has_history and not has_stats:
+            self.rebuild_statistics()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _encode(entry: Dict[str, Any]) -> str:
+        data = {key: value for key, value in entry.items() if key != 'id'}
+        return json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+
+    @staticmethod
+    def _decode(entry_id: int, data: str) -> Dict[str, Any]:
+        entry = {'id': entry_id}
+        entry.update(json.loads(data))
+        return entry
+
+    @staticmethod
+    def _apply_statistics(conn: sqlite3.Connection, entry: Dict[str, Any]) -> None:
+        stats = entry_statistics(entry)
+        day = stats['day']
+        conn.execute(
+            'INSERT INTO stats_daily (day, requests, detections) VALUES (?, 1, ?) '
+            'ON CONFLICT (day) DO UPDATE SET requests = requests + 1, '
+            'detections = detections + excluded.detections',
+            (day, stats['detections'])
+        )
+        conn.executemany(
+            'INSERT INTO stats_classes (day, class, count) VALUES (?, ?, ?) '
+            'ON CONFLICT (day, class) DO UPDATE SET count = count + excluded.count',
+            [(day, class_name, count) for class_name, count in stats['classes'].items()]
+        )
+        conn.executemany(
+            'INSERT INTO stats_confidence (day, bucket, count) VALUES (?, ?, ?) '
+            'ON CONFLICT (day, bucket) DO UPDATE SET count = count + excluded.count',
+            [(day, bucket, count) for bucket, count in enumerate(stats['confidence_histogram']) if count]
+        )
+
+    def append(self, entry: Dict[str, Any]) -> Dict[str, Any]:
+        return self.append_many([entry])[0]
+
+    def _store_frames(self, entry: Dict[str, Any], written: List[str]) -> Dict[str, Any]:
+        if self.frames_dir is None or not isinstance(entry.get('frame_results'), list):
+            return entry
+        path = save_frame_results(self.frames_dir, entry['frame_results'])
+        written.append(path)
+        compact = {key: value for key, value in entry.items() if key != 'frame_results'}
+        compact['frame_store'] = path
+        compact['frames_processed'] = len(entry['frame_results'])
+        return compact
+
+    def _write(self, entries: List[Dict[str, Any]], sql: str, with_id: bool) -> List[Dict[str, Any]]:
+        conn = self._connection()
+        stored = []
+        # Frame stores are written before the rows that point at them and
+        # removed again if the transaction fails
+        written: List[str] = []
+        try:
+            with conn:
+                for entry in entries:
+                    compact = self._store_frames(entry, written)
+                    params = (entry['timestamp'], entry['type'], self._encode(compact))
+                    cursor = conn.execute(sql, ((entry['id'],) if with_id else ()) + params)
+                    if cursor.rowcount == 0:
+                        # Ignored as a duplicate id: nothing new to count or point at
+                        if compact is not entry:
+                            shutil.rmtree(written.pop(), ignore_errors=True)
+                        continue
+                    # Aggregates come from the in-memory entry, before its frames are moved out
+                    self._apply_statistics(conn, entry)
+                    stored.append({'id': entry['id'] if with_id else cursor.lastrowid,
+                                   **{k: v for k, v in compact.items() if k != 'id'}})
+        except Exception:
+            for path in written:
+                shutil.rmtree(path, ignore_errors=True)
+            raise
+        return stored
+
+    def append_many(self, entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return self._write(entries, 'INSERT INTO history (timestamp, type, data) VALUES (?, ?, ?)', with_id=False)
+
+    def import_entries(self, entries: List[Dict[str, Any]]) -> int:
+        return len(self._write(
+            entries, 'INSERT OR IGNORE INTO history (id, timestamp, type, data) VALUES (?, ?, ?, ?)', with_id=True
+        ))
+
+    def update_many(self, entries: List[Dict[str, Any]]) -> int:
+        conn = self._connection()
+        with conn:
+            conn.executemany(
+                'UPDATE history SET data = ? WHERE id = ?',
+                [(self._encode(entry), entry['id']) for entry in entries]
+            )
+        return len(entries)
+
+    def get(self, entry_id: int) -> Optional[Dict[str, Any]]:
+        row = self._connection().execute(
+            'SELECT id, data FROM history WHERE id = ?', (entry_id,)
+        ).fetchone()
+        return self._decode(*row) if row else None
+
+    def query(self, entry_type: Optional[str] = None, start: Optional[str] = None,
+              end: Optional[str] = None, after_id: Optional[int] = None,
+              limit: Optional[int] = None, descending: bool = False) -> Iterator[Dict[str, Any]]:
+        """
+        Iterate over entries filtered by type and ISO timestamp range.
+
+        ``after_id`` continues past a previous page: entries with a larger id
+        in ascending order, or a smaller id when ``descending`` is set.
+        """
+        clauses = []
+        params: List[Any] = []
+        if entry_type:
+            clauses.append('type = ?')
+            params.append(entry_type)
+        if start:
+            clauses.append('timestamp >= ?')
+            params.append(start)
+        if end:
+            clauses.append('timestamp < ?')
+            params.append(end)
+        if after_id is not None:
+            clauses.append('id < ?' if descending else 'id > ?')
+            params.append(after_id)
+
+        sql = 'SELECT id, data FROM history'
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        sql += ' ORDER BY id DESC' if descending else ' ORDER BY id'
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params.append(limit)
+
+        cursor = self._connection().execute(sql, params)
+        for entry_id, data in cursor:
+            yield self._decode(entry_id, data)
+
+    def count(self) -> int:
+        return self._connection().execute('SELECT COUNT(*) FROM history').fetchone()[0]
+
+    def get_statistics(self) -> Dict[str, Any]:
+        conn = self._connection()
+        timeline = {}
+        daily = {}
+        total_requests = 0
+        total_detections = 0
+        for day, requests, detections in conn.execute(
+                'SELECT day, requests, detections FROM stats_daily ORDER BY day'):
+            timeline[day] = requests
+            daily[day] = {'requests': requests, 'detections': detections, 'classes': {}}
+            total_requests += requests
+            total_detections += detections
+
+        classes: Dict[str, int] = {}
+        for day, class_name, count in conn.execute(
+                'SELECT day, class, count FROM stats_classes ORDER BY day, class'):
+            daily[day]['classes'][class_name] = count
+            classes[class_name] = classes.get(class_name, 0) + count
+
+        histogram = [0] * CONFIDENCE_BINS
+        for bucket, count in conn.execute(
+                'SELECT bucket, SUM(count) FROM stats_confidence GROUP BY bucket'):
+            histogram[bucket] = count
+
+        return {
+            'total_requests': total_requests,
+            'total_detections': total_detections,
+            'timeline': timeline,
+            'daily': daily,
+            'classes': classes,
+            'confidence_histogram': histogram
+        }
+
+    def rebuild_statistics(self) -> Dict[str, Any]:
+        conn = self._connection()
+        with conn:
+            conn.execute('DELETE FROM stats_daily')
+            conn.execute('DELETE FROM stats_classes')
+            conn.execute('DELETE FROM stats_confidence')
+            for entry_id, data in conn.execute('SELECT id, data FROM history ORDER BY id').fetchall():
+                self._apply_statistics(conn, self._decode(entry_id, data))
+        return self.get_statistics()
+
+
+def strip_frame_results(entry: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Drop the per-frame detections of a video entry, keeping only their count.
+    """
+    if 'frame_store' in entry:
+        return {key: value for key, value in entry.items() if key != 'frame_store'}
+    if 'frame_results' not in entry:
+        return entry
+    stripped = {key: value for key, value in entry.items() if key != 'frame_results'}
+    stripped['frames_processed'] = len(entry['frame_results'])
+    return stripped
+
+
+def parse_date_bound(value: Optional[str], end: bool = False) -> Optional[str]:
+    """
+    Normalise a ``YYYY-MM-DD`` or ISO timestamp query bound.
+
+    A bare date used as an end bound covers the whole day.
+    """
+    if not value:
+        return None
+    if len(value) == 10:
+        day = datetime.date.fromisoformat(value)
+        if end:
+            day += datetime.timedelta(days=1)
+        return day.isoformat()
+    return datetime.datetime.fromisoformat(value).isoformat()
+
+
+HISTORY_BACKENDS = {
+    'sqlite': SQLiteHistoryStore,
+}
+
+
+def create_history_store(backend: str, path: str, frames_dir: Optional[str] = None) -> HistoryStore:
+    if backend not in HISTORY_BACKENDS:
+        raise ValueError(f"Unknown history backend: {backend}")
+    return HISTORY_BACKENDS[backend](path, frames_dir=frames_dir)
+
+
+def migrate_json_history(store: HistoryStore, history_file: str) -> int:
+    """
+    One-time import of the legacy ``request_history.json`` file.
+
+    The file is renamed to ``<name>.migrated`` afterwards so the migration
+    does not run twice. Returns the number of imported entries.
+    """
+    if not os.path.exists(history_file):
+        return 0
+
+    try:
+        with open(history_file, 'r', encoding='utf-8') as f:
+            history = json.load(f)
+    except (json.JSONDecodeError, IOError) as e:
+        print(f"Error reading history file {history_file}: {e}")
+        return 0
+
+    # Old files hold either a bare list or {"requests": [...]}
+    if isinstance(history, dict):
+        history = history.get('requests', [])
+
+    entries = [entry for entry in history if 'id' in entry and 'timestamp' in entry and 'type' in entry]
+    imported = store.import_entries(entries)
+    os.replace(history_file, f'{history_file}.migrated')
+    print(f"Migrated {imported} history entries from {history_file}")
+    if imported < len(entries):
+        print(f"Skipped {len(entries) - imported} entries whose ids are already in the history")
+    return imported
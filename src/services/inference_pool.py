@@ -0,0 +1,274 @@
+import itertools
+import multiprocessing as mp
+import queue
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from PIL import Image
+
+
+class InferencePoolBusy(Exception):
+    pass
+
+
+class InferenceTimeout(Exception):
+    pass
+
+
+class PooledBoxes:
+    """
+    Minimal stand-in for ``ultralytics`` boxes built from plain arrays.
+
+    Iterating yields one single-row ``PooledBoxes`` per detection, so code
+    written against ``box.cls[0]``, ``box.conf[0]`` and ``box.xyxy[0]`` works
+    unchanged.
+    """
+
+    def __init__(self, xyxy: np.ndarray, conf: np.ndarray, cls: np.ndarray):
+        self.xyxy = xyxy.reshape(-1, 4)
+        self.conf = conf.reshape(-1)
+        self.cls = cls.reshape(-1)
+
+    def __len__(self) -> int:
+        return len(self.conf)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield PooledBoxes(self.xyxy[i:i + 1], self.conf[i:i + 1], self.cls[i:i + 1])
+
+
+class PooledResult:
+
+    def __init__(self, boxes: PooledBoxes):
+        self.boxes = boxes
+
+
+def _worker_main(worker_index: int, control_queue, task_queue, result_queue) -> None:
+    from src.services.backends import load_model, warm_up
+
+    # Workers are forked at startup, before the weights may even be
+    # downloaded, and wait here for the model to load
+    message = control_queue.get()
+    if message is None:
+        return
+    model_path, warmup_imgsz = message
+    try:
+        model = load_model(model_path)
+        if warmup_imgsz:
+            warm_up(model, warmup_imgsz)
+    except Exception as e:
+        result_queue.put(('failed', worker_index, str(e)))
+        return
+    result_queue.put(('ready', worker_index, dict(model.names)))
+
+    while True:
+        task = task_queue.get()
+        if task is None:
+            return
+        request_id, shm_name, shape, dtype, kwargs = task
+        try:
+            shm = shared_memory.SharedMemory(name=shm_name)
+        except FileNotFoundError:
+            # The caller gave up on this request and already released the buffer
+            continue
+
+        try:
+            frames = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+            results = model(list(frames), **kwargs)
+            payload = [
+                (result.boxes.xyxy.cpu().numpy(), result.boxes.conf.cpu().numpy(), result.boxes.cls.cpu().numpy())
+                for result in results
+            ]
+            # Results keep references to the input frames; drop them before
+            # closing the shared buffer
+            del results, frames
+            result_queue.put(('result', request_id, payload, None))
+        except Exception as e:
+            result_queue.put(('result', request_id, None, str(e)))
+        finally:
+            try:
+                shm.close()
+            except BufferError:
+                pass
+
+
+class InferencePool:
+    """
+    Pool of worker processes that each load the model weights once.
+
+    Images are copied into shared memory and only the buffer name travels
+    through the bounded task queue. Callers block on their own request, and
+    a full queue or a slow request surfaces as ``InferencePoolBusy`` or
+    ``InferenceTimeout``. Instances are callable like a ``YOLO`` model and
+    are safe to share between threads.
+    """
+
+    def __init__(self, workers: int = 2, queue_size: int = 32,
+                 submit_timeout: float = 5.0, timeout: float = 120.0):
+        self.workers = max(1, workers)
+        self.queue_size = max(1, queue_size)
+        self.submit_timeout = submit_timeout
+        self.timeout = timeout
+        self.names: Dict[int, str] = {}
+        self._ids = itertools.count()
+        self._pending: Dict[int, Any] = {}
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        # Set by the first worker that loaded the model or failed to
+        self._loaded = threading.Event()
+        self._load_error: Optional[str] = None
+        self._processes: List[mp.Process] = []
+        self._control_queues: List[Any] = []
+        self._task_queue = None
+        self._result_queue = None
+
+    def start(self) -> None:
+        """
+        Fork the worker processes. Call this from the main thread before any
+        other thread starts: a fork copies only the calling thread, and a
+        lock another thread held at that moment would stay locked in the
+        workers. The workers load the model once ``load()`` is called.
+        """
+        ctx = mp.get_context('fork')
+        # Start the tracker first so workers inherit it instead of starting
+        # their own, which would "clean up" buffers the parent still owns
+        resource_tracker.ensure_running()
+        self._task_queue = ctx.Queue(maxsize=self.queue_size)
+        self._result_queue = ctx.Queue()
+        for index in range(self.workers):
+            # One control queue per worker, so each receives the model exactly once
+            control_queue = ctx.SimpleQueue()
+            process = ctx.Process(
+                target=_worker_main,
+                args=(index, control_queue, self._task_queue, self._result_queue),
+                name=f'inference-worker-{index}',
+                daemon=True
+            )
+            process.start()
+            self._processes.append(process)
+            self._control_queues.append(control_queue)
+
+        threading.Thread(target=self._dispatch, name='inference-dispatcher', daemon=True).start()
+
+    def load(self, model_path: str, warmup_imgsz: int = 0, ready_timeout: float = 300.0) -> None:
+        """
+        Have every worker load and warm up ``model_path``. Returns once the
+        pool can serve requests and raises ``RuntimeError`` if the workers
+        fail to load the model or take longer than ``ready_timeout``.
+        """
+        for control_queue in self._control_queues:
+            control_queue.put((model_path, warmup_imgsz))
+        if not self._loaded.wait(ready_timeout):
+            raise RuntimeError('Inference workers did not load the model in time')
+        if not self._ready.is_set():
+            raise RuntimeError(f'Inference workers could not load the model: {self._load_error}')
+
+    def shutdown(self) -> None:
+        # Workers still waiting for a model stop on the control queue,
+        # the others on the task queue
+        for control_queue in self._control_queues:
+            control_queue.put(None)
+        for _ in self._processes:
+            self._task_queue.put(None)
+        for process in self._processes:
+            process.join(timeout=10)
+
+    def get_queue_depth(self) -> int:
+        return self._task_queue.qsize() if self._task_queue is not None else 0
+
+    def _dispatch(self) -> None:
+        while True:
+            message = self._result_queue.get()
+            if message[0] == 'ready':
+                self.names = message[2]
+                self._ready.set()
+                self._loaded.set()
+                continue
+            if message[0] == 'failed':
+                self._load_error = message[2]
+                self._loaded.set()
+                continue
+
+            _, request_id, payload, error = message
+            with self._lock:
+                pending = self._pending.pop(request_id, None)
+            if pending is None:
+                continue
+            future, shm = pending
+            self._release(shm)
+            if error is not None:
+                future.set_exception(RuntimeError(error))
+            else:
+                future.set_result([PooledResult(PooledBoxes(*arrays)) for arrays in payload])
+
+    @staticmethod
+    def _release(shm: shared_memory.SharedMemory) -> None:
+        shm.close()
+        try:
+            shm.unlink()
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def _to_array(source) -> np.ndarray:
+        if isinstance(source, Image.Image):
+            # The model reads NumPy input as BGR, like frames from OpenCV
+            return np.asarray(source.convert('RGB'))[:, :, ::-1]
+        return np.asarray(source)
+
+    def _submit(self, frames: List[np.ndarray], kwargs: Dict[str, Any]) -> Future:
+        shape = (len(frames),) + frames[0].shape
+        dtype = frames[0].dtype
+        shm = shared_memory.SharedMemory(create=True, size=int(np.prod(shape)) * dtype.itemsize)
+        buffer = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        for i, frame in enumerate(frames):
+            buffer[i] = frame
+        del buffer
+
+        request_id = next(self._ids)
+        future: Future = Future()
+        future.request_id = request_id
+        with self._lock:
+            self._pending[request_id] = (future, shm)
+        try:
+            self._task_queue.put((request_id, shm.name, shape, dtype.str, kwargs), timeout=self.submit_timeout)
+        except queue.Full:
+            self._cancel(request_id)
+            raise InferencePoolBusy('Inference queue is full, try again later')
+        return future
+
+    def _cancel(self, request_id: int) -> None:
+        with self._lock:
+            pending = self._pending.pop(request_id, None)
+        if pending is not None:
+            self._release(pending[1])
+
+    def _wait(self, future: Future, timeout: Optional[float]) -> List[PooledResult]:
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            self._cancel(future.request_id)
+            raise InferenceTimeout(f'Inference did not finish within {timeout} seconds')
+
+    def __call__(self, source, timeout: Optional[float] = None, **kwargs) -> List[PooledResult]:
+        if not self._ready.is_set():
+            raise RuntimeError('Inference pool is not started')
+        timeout = self.timeout if timeout is None else timeout
+
+        items = source if isinstance(source, (list, tuple)) else [source]
+        frames = [self._to_array(item) for item in items]
+        if not frames:
+            return []
+
+        # One shared buffer per batch when the frames line up, as video frames do
+        if all(frame.shape == frames[0].shape and frame.dtype == frames[0].dtype for frame in frames):
+            return self._wait(self._submit(frames, kwargs), timeout)
+
+        futures = [self._submit([frame], kwargs) for frame in frames]
+        results = []
+        for future in futures:
+            results.extend(self._wait(future, timeout))
+        return results
@@ -0,0 +1,208 @@
+import errno
+import os
+import threading
+import time
+import zipfile
+from typing import BinaryIO, Dict, List, Optional, Tuple
+
+import cv2
+
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp', '.tif', '.tiff')
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+class UploadStalled(Exception):
+    pass
+
+
+class Ingest:
+    """
+    State of an upload that is still being written to ``path``.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.bytes_written = 0
+        self.failed = False
+        # Set by a reader that gave up waiting for more data
+        self.stalled = False
+        self.last_write = time.monotonic()
+        self.done = threading.Event()
+
+
+_active_ingests: Dict[str, Ingest] = {}
+_ingests_lock = threading.Lock()
+
+
+def begin_ingest(path: str) -> Ingest:
+    ingest = Ingest(path)
+    with _ingests_lock:
+        _active_ingests[path] = ingest
+    return ingest
+
+
+def finish_ingest(ingest: Ingest, failed: bool = False) -> None:
+    ingest.failed = failed
+    with _ingests_lock:
+        _active_ingests.pop(ingest.path, None)
+    ingest.done.set()
+
+
+def get_ingest(path: str) -> Optional[Ingest]:
+    with _ingests_lock:
+        return _active_ingests.get(path)
+
+
+def stream_to_file(stream, ingest: Ingest, max_bytes: int, chunk_size: int = 1024 * 1024) -> int:
+    """
+    Copy a request body to ``ingest.path`` chunk by chunk, so memory use does
+    not depend on the upload size. Raises ``UploadTooLarge`` past ``max_bytes``.
+    """
+    with open(ingest.path, 'wb') as f:
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                break
+            if ingest.bytes_written + len(chunk) > max_bytes:
+                raise UploadTooLarge(f'File exceeds the {max_bytes // (1024 * 1024)} MB limit')
+            f.write(chunk)
+            # Readers tail the file, so every chunk is made visible right away
+            f.flush()
+            ingest.bytes_written += len(chunk)
+            ingest.last_write = time.monotonic()
+    return ingest.bytes_written
+
+
+def _is_stalled(ingest: Ingest, stall_timeout: float) -> bool:
+    return time.monotonic() - ingest.last_write > stall_timeout
+
+
+def _feed_fifo(ingest: Ingest, fifo_path: str, poll_interval: float, open_timeout: float,
+               stall_timeout: float, cancel_event: Optional[threading.Event]) -> None:
+    # Non-blocking open fails until the decoder opens the read end, which
+    # keeps this thread from hanging if the decoder never does
+    deadline = time.monotonic() + open_timeout
+    while True:
+        try:
+            fd = os.open(fifo_path, os.O_WRONLY | os.O_NONBLOCK)
+            break
+        except OSError as e:
+            if e.errno != errno.ENXIO or time.monotonic() > deadline:
+                os.unlink(fifo_path)
+                return
+            time.sleep(poll_interval)
+
+    os.unlink(fifo_path)
+    os.set_blocking(fd, True)
+    try:
+        with open(ingest.path, 'rb') as src, os.fdopen(fd, 'wb') as dst:
+            # Closing the pipe early ends the decode, and analyze_video then
+            # tells a cancel or a stall from a finished upload
+            while not ingest.failed and not (cancel_event is not None and cancel_event.is_set()):
+                chunk = src.read(1024 * 1024)
+                if chunk:
+                    dst.write(chunk)
+                elif ingest.done.is_set():
+                    break
+                elif _is_stalled(ingest, stall_timeout):
+                    ingest.stalled = True
+                    break
+                else:
+                    time.sleep(poll_interval)
+    except BrokenPipeError:
+        # The decoder stopped reading; whatever it needs next comes from the file
+        pass
+
+
+def open_video_capture(video_path: str, poll_interval: float = 0.05, open_timeout: float = 10.0,
+                       stall_timeout: float = 60.0,
+                       cancel_event: Optional[threading.Event] = None) -> cv2.VideoCapture:
+    """
+    Open a video for frame sampling.
+
+    While the upload is still being written, the growing file is fed to the
+    decoder through a FIFO so sampling starts before the upload finishes.
+    Containers that cannot be decoded from a pipe fall back to waiting for
+    the upload and opening the finished file. Either way, an upload that
+    receives no data for ``stall_timeout`` seconds is given up on (see
+    ``check_ingest``), and setting ``cancel_event`` stops the wait.
+    """
+    ingest = get_ingest(video_path)
+    if ingest is None:
+        return cv2.VideoCapture(video_path)
+
+    fifo_path = f'{video_path}.fifo'
+    os.mkfifo(fifo_path)
+    threading.Thread(
+        target=_feed_fifo,
+        args=(ingest, fifo_path, poll_interval, open_timeout, stall_timeout, cancel_event),
+        name='upload-fifo-feeder',
+        daemon=True
+    ).start()
+
+    cap = cv2.VideoCapture(fifo_path)
+    if cap.isOpened():
+        return cap
+
+    while not ingest.done.wait(poll_interval):
+        if cancel_event is not None and cancel_event.is_set():
+            break
+        if _is_stalled(ingest, stall_timeout):
+            ingest.stalled = True
+            break
+    check_ingest(ingest)
+    return cv2.VideoCapture(video_path)
+
+
+def check_ingest(ingest: Ingest) -> None:
+    """
+    Raise if the upload behind ``ingest`` failed or stalled, so frames read
+    from it are not taken for the whole video.
+    """
+    if ingest.stalled:
+        raise UploadStalled('Upload stopped receiving data before it finished')
+    if ingest.failed:
+        raise ValueError('Upload failed before it finished')
+
+
+def read_zip_images(stream: BinaryIO, max_files: int, max_bytes: int) -> List[Tuple[str, bytes]]:
+    """
+    Read the images of a zip archive as ``(name, bytes)`` pairs in archive
+    order, skipping directories and other files.
+
+    The member count and the unpacked size are checked against the limits
+    before anything is extracted, and the size again while reading, since
+    the sizes in the archive directory may not be truthful.
+    """
+    try:
+        archive = zipfile.ZipFile(stream)
+    except zipfile.BadZipFile:
+        raise ValueError('Invalid zip archive')
+
+    with archive:
+        members = [
+            info for info in archive.infolist()
+            if not info.is_dir()
+            and not os.path.basename(info.filename).startswith('.')
+            and not info.filename.startswith('__MACOSX/')
+            and os.path.splitext(info.filename)[1].lower() in IMAGE_EXTENSIONS
+        ]
+        if len(members) > max_files:
+            raise UploadTooLarge(f'Archive holds more than {max_files} images')
+        if sum(info.file_size for info in members) > max_bytes:
+            raise UploadTooLarge(f'Archive unpacks to more than {max_bytes // (1024 * 1024)} MB')
+
+        images = []
+        total = 0
+        for info in members:
+            with archive.open(info) as member:
+                data = member.read(max_bytes - total + 1)
+            total += len(data)
+            if total > max_bytes:
+                raise UploadTooLarge(f'Archive unpacks to more than {max_bytes // (1024 * 1024)} MB')
+            images.append((info.filename, data))
+        return images
@@ -0,0 +1,364 @@
+import datetime
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from src.services.application import ModelNotReady
+from src.services.metrics import stage
+from src.services.processing import AnalysisCancelled, analyze_video
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_COMPLETED = 'completed'
+JOB_FAILED = 'failed'
+JOB_CANCELLED = 'cancelled'
+
+FINISHED_STATUSES = (JOB_COMPLETED, JOB_FAILED, JOB_CANCELLED)
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class JobEvents:
+    """
+    Ordered events of one job for live subscribers.
+
+    Events are numbered from 1 and kept until the job finishes, so a client
+    that reconnects with ``Last-Event-ID`` picks up where it left off.
+    """
+
+    def __init__(self):
+        self._events: List[Tuple[int, str, Dict[str, Any]]] = []
+        self._closed = False
+        self._condition = threading.Condition()
+
+    def publish(self, name: str, data: Dict[str, Any], final: bool = False) -> None:
+        with self._condition:
+            if self._closed:
+                return
+            self._events.append((len(self._events) + 1, name, data))
+            self._closed = final
+            self._condition.notify_all()
+
+    def subscribe(self, after_id: int = 0,
+                  heartbeat: float = 15.0) -> Iterator[Optional[Tuple[int, str, Dict[str, Any]]]]:
+        """
+        Yield ``(id, name, data)`` events after ``after_id`` as they are
+        published until the final one, and ``None`` after ``heartbeat``
+        seconds without events so idle connections can be kept alive.
+        """
+        position = max(0, after_id)
+        while True:
+            with self._condition:
+                if position >= len(self._events) and not self._closed:
+                    self._condition.wait(heartbeat)
+                events = self._events[position:]
+                closed = self._closed
+            if not events and not closed:
+                yield None
+            for event in events:
+                yield event
+            position += len(events)
+            if closed and not events:
+                return
+
+
+class JobStore:
+    """
+    SQLite-backed job table so queued and running jobs survive a restart.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS jobs ('
+                ' id TEXT PRIMARY KEY,'
+                ' status TEXT NOT NULL,'
+                ' video_path TEXT NOT NULL,'
+                ' created_at TEXT NOT NULL,'
+                ' updated_at TEXT NOT NULL,'
+                ' processed_frames INTEGER NOT NULL DEFAULT 0,'
+                ' total_frames INTEGER NOT NULL DEFAULT 0,'
+                ' result TEXT,'
+                ' error TEXT,'
+                ' history_id INTEGER)'
+            )
+            # Jobs used to keep a copy of their history entry in ``result``;
+            # they now point at the entry, so retention updates stay visible
+            columns = {row['name'] for row in conn.execute('PRAGMA table_info(jobs)')}
+            if 'history_id' not in columns:
+                conn.execute('ALTER TABLE jobs ADD COLUMN history_id INTEGER')
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _execute(self, sql: str, params=()) -> None:
+        with self._lock, self._connect() as conn:
+            conn.execute(sql, params)
+
+    def create(self, job_id: str, video_path: str) -> None:
+        now = datetime.datetime.now().isoformat()
+        self._execute(
+            'INSERT INTO jobs (id, status, video_path, created_at, updated_at) VALUES (?, ?, ?, ?, ?)',
+            (job_id, JOB_QUEUED, video_path, now, now)
+        )
+
+    def delete(self, job_id: str) -> None:
+        self._execute('DELETE FROM jobs WHERE id = ?', (job_id,))
+
+    def update(self, job_id: str, **fields) -> None:
+        fields['updated_at'] = datetime.datetime.now().isoformat()
+        columns = ', '.join(f'{name} = ?' for name in fields)
+        self._execute(f'UPDATE jobs SET {columns} WHERE id = ?', (*fields.values(), job_id))
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock, self._connect() as conn:
+            row = conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        result = job.pop('result')
+        if job['history_id'] is None and result is not None:
+            job['history_id'] = json.loads(result).get('id')
+        return job
+
+    def list_unfinished(self) -> List[str]:
+        with self._lock, self._connect() as conn:
+            rows = conn.execute(
+                'SELECT id FROM jobs WHERE status IN (?, ?) ORDER BY created_at',
+                (JOB_QUEUED, JOB_RUNNING)
+            ).fetchall()
+        return [row['id'] for row in rows]
+
+    def list_unfinished_paths(self) -> List[str]:
+        with self._lock, self._connect() as conn:
+            rows = conn.execute(
+                'SELECT video_path FROM jobs WHERE status IN (?, ?)',
+                (JOB_QUEUED, JOB_RUNNING)
+            ).fetchall()
+        return [row['video_path'] for row in rows]
+
+
+class JobManager:
+    """
+    Bounded queue of video analysis jobs served by a pool of worker threads.
+
+    Every worker loads its own model instance once and keeps it for its
+    lifetime, so workers never share a model between threads.
+    """
+
+    def __init__(self, app_context, store: JobStore, workers: int = 1, queue_size: int = 16):
+        self.app_context = app_context
+        self.store = store
+        self.workers = max(1, workers)
+        self._queue: queue.Queue = queue.Queue(maxsize=max(1, queue_size))
+        self._threads: List[threading.Thread] = []
+        # Live events and cancel flags of queued and running jobs
+        self._events: Dict[str, JobEvents] = {}
+        self._cancel: Dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f'video-job-worker-{index}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+        # Jobs interrupted by a restart go back on the queue. This runs in its
+        # own thread because the backlog may be larger than the queue bound.
+        threading.Thread(target=self._recover, name='video-job-recovery', daemon=True).start()
+
+    def _recover(self) -> None:
+        for job_id in self.store.list_unfinished():
+            self.store.update(job_id, status=JOB_QUEUED, processed_frames=0)
+            self._track(job_id)
+            self._queue.put(job_id)
+
+    def _track(self, job_id: str) -> None:
+        with self._lock:
+            self._events[job_id] = JobEvents()
+            self._cancel[job_id] = threading.Event()
+        self._publish(job_id, 'status', {'status': JOB_QUEUED})
+
+    def _untrack(self, job_id: str) -> None:
+        with self._lock:
+            self._events.pop(job_id, None)
+            self._cancel.pop(job_id, None)
+
+    def _publish(self, job_id: str, name: str, data: Dict[str, Any], final: bool = False) -> None:
+        with self._lock:
+            events = self._events.get(job_id)
+        if events is not None:
+            events.publish(name, data, final=final)
+
+    def submit(self, video_path: str) -> str:
+        """
+        Queue a video for analysis. Jobs are accepted while the model is
+        still loading; raises ``ModelNotReady`` once loading has failed and
+        ``JobQueueFull`` when the queue is at its bound.
+        """
+        status = self.app_context.get_status()
+        if status['status'] == 'failed':
+            raise ModelNotReady(status['error'])
+        job_id = uuid.uuid4().hex
+        self.store.create(job_id, video_path)
+        self._track(job_id)
+        try:
+            self._queue.put_nowait(job_id)
+        except queue.Full:
+            self._untrack(job_id)
+            self.store.delete(job_id)
+            raise JobQueueFull('Video job queue is full, try again later')
+        return job_id
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self.store.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[str]:
+        """
+        Cancel a queued or running job. A running job stops before its next
+        frame, removes the images it wrote and frees its worker. Returns the
+        job status before the call, so a status in ``FINISHED_STATUSES``
+        means nothing was cancelled, or None if the job does not exist.
+        """
+        job = self.store.get(job_id)
+        if job is None:
+            return None
+        if job['status'] in FINISHED_STATUSES:
+            return job['status']
+        with self._lock:
+            cancel = self._cancel.get(job_id)
+        if cancel is not None:
+            cancel.set()
+        if job['status'] == JOB_QUEUED:
+            # The worker drops it when it comes off the queue
+            self.store.update(job_id, status=JOB_CANCELLED)
+            self._publish(job_id, JOB_CANCELLED, {'status': JOB_CANCELLED}, final=True)
+        return job['status']
+
+    def subscribe(self, job_id: str, after_id: int = 0,
+                  heartbeat: float = 15.0) -> Optional[Iterator[Optional[Tuple[int, str, Dict[str, Any]]]]]:
+        """
+        Live events of a job, see ``JobEvents.subscribe``. A finished job
+        yields a single event with its final status. Returns None if the job
+        does not exist.
+        """
+        with self._lock:
+            events = self._events.get(job_id)
+        if events is not None:
+            return events.subscribe(after_id, heartbeat)
+
+        job = self.store.get(job_id)
+        if job is None:
+            return None
+        if job['status'] not in FINISHED_STATUSES:
+            # Queued before a restart and not picked up by recovery yet
+            return iter([(1, 'status', {'status': job['status']})])
+        history_entry = None
+        if job['history_id'] is not None:
+            history_entry = self.app_context.get_history_entry(job['history_id'])
+        return iter([(1, job['status'], self._final_event(job_id, job['status'], job['error'], history_entry))])
+
+    @staticmethod
+    def _final_event(job_id: str, status: str, error: Optional[str] = None,
+                     history_entry: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        data = {'status': status}
+        if status == JOB_COMPLETED:
+            data['result_url'] = f'/jobs/{job_id}/result'
+            if history_entry is not None:
+                data['history_id'] = history_entry['id']
+                data['summary'] = history_entry['summary']
+        elif error:
+            data['error'] = error
+        return data
+
+    def get_queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def get_active_paths(self) -> List[str]:
+        """
+        Videos of queued and running jobs, which must stay on disk until the
+        jobs finish.
+        """
+        return self.store.list_unfinished_paths()
+
+    def _worker(self) -> None:
+        # Jobs queue up while the model is still loading in the background;
+        # if loading fails, the queued jobs fail instead of waiting forever
+        model = self.app_context.load_model() if self.app_context.wait_until_ready() else None
+        while True:
+            job_id = self._queue.get()
+            try:
+                self._run_job(job_id, model)
+            finally:
+                self._queue.task_done()
+
+    def _run_job(self, job_id: str, model) -> None:
+        try:
+            job = self.store.get(job_id)
+            with self._lock:
+                cancel = self._cancel.get(job_id) or threading.Event()
+            if job is None or job['status'] == JOB_CANCELLED or cancel.is_set():
+                return
+            if model is None:
+                error = self.app_context.get_status().get('error') or 'Model is not available'
+                self.store.update(job_id, status=JOB_FAILED, error=error)
+                self._publish(job_id, JOB_FAILED, self._final_event(job_id, JOB_FAILED, error), final=True)
+                return
+            self.store.update(job_id, status=JOB_RUNNING)
+            self._publish(job_id, 'status', {'status': JOB_RUNNING})
+            self._analyze(job_id, job['video_path'], model, cancel)
+        finally:
+            self._untrack(job_id)
+
+    def _analyze(self, job_id: str, video_path: str, model, cancel: threading.Event) -> None:
+        started = time.monotonic()
+
+        def on_progress(processed_frames: int, total_frames: int) -> None:
+            self.store.update(job_id, processed_frames=processed_frames, total_frames=total_frames)
+            elapsed = time.monotonic() - started
+            rate = processed_frames / elapsed if elapsed > 0 else 0.0
+            remaining = max(0, total_frames - processed_frames)
+            self._publish(job_id, 'progress', {
+                'processed_frames': processed_frames,
+                'total_frames': total_frames,
+                'percent': round(100 * processed_frames / total_frames, 1) if total_frames else 0,
+                'frames_per_second': round(rate, 2),
+                # Unknown while the length of a streamed upload is not known yet
+                'eta_seconds': round(remaining / rate, 1) if rate > 0 and total_frames else None
+            })
+
+        def on_frame(frame_result: Dict[str, Any]) -> None:
+            self._publish(job_id, 'frame', frame_result)
+
+        try:
+            with stage('video_job'):
+                history_entry = analyze_video(self.app_context, video_path, model=model,
+                                              progress_callback=on_progress, frame_callback=on_frame,
+                                              cancel_event=cancel)
+            self.store.update(job_id, status=JOB_COMPLETED, history_id=history_entry['id'])
+            self._publish(job_id, JOB_COMPLETED,
+                          self._final_event(job_id, JOB_COMPLETED, history_entry=history_entry), final=True)
+        except Exception as e:
+            # A cancelled streamed upload may also fail the decode once its file is removed
+            if isinstance(e, AnalysisCancelled) or cancel.is_set():
+                print(f"Video job {job_id} cancelled")
+                self.store.update(job_id, status=JOB_CANCELLED)
+                self._publish(job_id, JOB_CANCELLED, {'status': JOB_CANCELLED}, final=True)
+                return
+            print(f"Video job {job_id} failed: {e}")
+            self.store.update(job_id, status=JOB_FAILED, error=str(e))
+            self._publish(job_id, JOB_FAILED, self._final_event(job_id, JOB_FAILED, str(e)), final=True)
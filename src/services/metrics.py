@@ -0,0 +1,167 @@
+import bisect
+import cProfile
+import datetime
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+# Upper bounds in seconds, from a few milliseconds for decoding up to the
+# length of a video job
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+LabelSet = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """
+    Cumulative-bucket latency histogram in the Prometheus layout.
+    """
+
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[LabelSet, List] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Per-bucket counts (plus +Inf), sum and count
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            snapshot = [(key, list(counts), total, count) for key, (counts, total, count) in self._series.items()]
+        for key, counts, total, count in sorted(snapshot):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{self.name}_bucket{_format_labels(key + (("le", le),))} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(key)} {total}')
+            lines.append(f'{self.name}_count{_format_labels(key)} {count}')
+        return lines
+
+
+def _format_labels(labels: LabelSet) -> str:
+    if not labels:
+        return ''
+    pairs = ','.join('{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"')) for k, v in labels)
+    return '{' + pairs + '}'
+
+
+class MetricsRegistry:
+    """
+    Stage and request latency histograms plus gauges that are read at scrape
+    time (queue depths, cache counters).
+
+    Recording a sample is a ``perf_counter`` call and a short locked update,
+    cheap enough to leave on in production.
+    """
+
+    def __init__(self):
+        self.enabled = True
+        self.stage_seconds = Histogram('pipeline_stage_seconds', 'Time spent in each pipeline stage')
+        self.request_seconds = Histogram('http_request_seconds', 'Request latency by endpoint and status')
+        self._gauges: List[Tuple[str, str, str, Callable[[], Dict[LabelSet, float]]]] = []
+
+    def register_gauge(self, name: str, help_text: str, read: Callable[[], Dict[LabelSet, float]],
+                       metric_type: str = 'gauge') -> None:
+        """
+        ``read`` returns ``{labels: value}`` and is called on every scrape.
+        """
+        self._gauges.append((name, help_text, metric_type, read))
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stage_seconds.observe(time.perf_counter() - start, stage=name)
+
+    def observe_request(self, endpoint: str, status: int, seconds: float) -> None:
+        if self.enabled:
+            self.request_seconds.observe(seconds, endpoint=endpoint, status=str(status))
+
+    def render(self) -> str:
+        lines = self.stage_seconds.render() + self.request_seconds.render()
+        for name, help_text, metric_type, read in self._gauges:
+            try:
+                values = read()
+            except Exception as e:
+                print(f'Could not read metric {name}: {e}')
+                continue
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {metric_type}')
+            for key, value in sorted(values.items()):
+                lines.append(f'{name}{_format_labels(key)} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+def stage(name: str):
+    """
+    Time a block as pipeline stage ``name``::
+
+        with stage('inference'):
+            results = model(image)
+    """
+    return registry.stage(name)
+
+
+class RequestProfiler:
+    """
+    Profile a random sample of requests with cProfile and dump one ``.prof``
+    file per request into ``profile_dir``.
+
+    Only one request is profiled at a time, since the interpreter allows a
+    single active profiler.
+    """
+
+    def __init__(self, sample_rate: float, profile_dir: str):
+        self.sample_rate = sample_rate
+        self.profile_dir = profile_dir
+        self._active = threading.Lock()
+
+    def start(self) -> Optional[cProfile.Profile]:
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return None
+        if not self._active.acquire(blocking=False):
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler (e.g. a debugger) is already attached
+            self._active.release()
+            return None
+        return profiler
+
+    def stop(self, profiler: cProfile.Profile, name: str) -> str:
+        try:
+            profiler.disable()
+        finally:
+            self._active.release()
+        os.makedirs(self.profile_dir, exist_ok=True)
+        safe_name = ''.join(c if c.isalnum() or c in '-_' else '_' for c in name)
+        timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+        path = os.path.join(self.profile_dir, f'{timestamp}_{safe_name}.prof')
+        profiler.dump_stats(path)
+        return path
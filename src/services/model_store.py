@@ -0,0 +1,137 @@
+import contextlib
+import hashlib
+import os
+import time
+from typing import Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: a single process is assumed
+    fcntl = None
+
+
+class ModelDownloadError(Exception):
+    pass
+
+
+def file_sha256(path: str, chunk_size: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@contextlib.contextmanager
+def _file_lock(path: str) -> Iterator[None]:
+    with open(path, 'a+') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class ModelArtifactStore:
+    """
+    Versioned local cache of downloaded model weights.
+
+    Each version lives in ``cache_dir/<version>/``. Downloads go to a
+    ``.part`` file that is resumed with HTTP Range requests after a failure,
+    checked against the expected SHA-256 and renamed into place, so a
+    half-written file is never loaded. An exclusive file lock per version
+    lets several processes share the cache: one downloads, the others wait
+    and reuse the result.
+    """
+
+    def __init__(self, cache_dir: str, timeout: float = 30.0, retries: int = 3,
+                 chunk_size: int = 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.timeout = timeout
+        self.retries = max(0, retries)
+        self.chunk_size = chunk_size
+
+    @staticmethod
+    def get_version(url: str, sha256: Optional[str] = None, version: Optional[str] = None) -> str:
+        if version:
+            return version
+        if sha256:
+            return sha256[:16]
+        return hashlib.sha1(url.encode('utf-8')).hexdigest()[:16]
+
+    def get_path(self, url: str, filename: str, sha256: Optional[str] = None,
+                 version: Optional[str] = None) -> str:
+        return os.path.join(self.cache_dir, self.get_version(url, sha256, version), filename)
+
+    def fetch(self, url: str, filename: str, sha256: Optional[str] = None,
+              version: Optional[str] = None) -> str:
+        """
+        Return the cached path of ``filename`` from ``url``, downloading it
+        first if this version is not cached yet.
+        """
+        path = self.get_path(url, filename, sha256, version)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        with _file_lock(os.path.join(os.path.dirname(path), '.lock')):
+            if os.path.exists(path) and self._is_verified(path, sha256):
+                return path
+
+            part_path = f'{path}.part'
+            for attempt in range(self.retries + 1):
+                try:
+                    self._download(url, part_path)
+                    break
+                except ModelDownloadError:
+                    raise
+                except Exception as e:
+                    if attempt == self.retries:
+                        raise ModelDownloadError(f'Failed to download model from {url}: {e}')
+                    delay = 2 ** attempt
+                    print(f'Model download interrupted ({e}), resuming in {delay}s')
+                    time.sleep(delay)
+
+            actual = file_sha256(part_path)
+            if sha256 and actual != sha256.lower():
+                os.remove(part_path)
+                raise ModelDownloadError(f'Checksum mismatch for {url}: expected {sha256}, got {actual}')
+
+            os.replace(part_path, path)
+            # The checksum is recorded so later starts skip re-hashing the weights
+            with open(f'{path}.sha256', 'w', encoding='utf-8') as f:
+                f.write(actual)
+            print(f'Model downloaded to {path}')
+            return path
+
+    def _is_verified(self, path: str, sha256: Optional[str]) -> bool:
+        if not sha256:
+            return True
+        try:
+            with open(f'{path}.sha256', 'r', encoding='utf-8') as f:
+                recorded = f.read().strip()
+        except OSError:
+            recorded = file_sha256(path)
+        return recorded == sha256.lower()
+
+    def _download(self, url: str, part_path: str) -> None:
+        import requests
+
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        headers = {'Range': f'bytes={offset}-'} if offset else {}
+        with requests.get(url, stream=True, headers=headers, timeout=self.timeout) as response:
+            if response.status_code == 416 and offset:
+                # Nothing left past the end of the partial file
+                return
+            if response.status_code in (401, 403, 404):
+                raise ModelDownloadError(f'Model download from {url} failed with HTTP {response.status_code}')
+            response.raise_for_status()
+            if response.status_code != 206:
+                # The server ignored the range; start over
+                offset = 0
+            print(f'Downloading model from {url}' + (f' (resuming at {offset} bytes)' if offset else ''))
+            with open(part_path, 'ab' if offset else 'wb') as f:
+                for chunk in response.iter_content(chunk_size=self.chunk_size):
+                    f.write(chunk)
+                f.flush()
+                os.fsync(f.fileno())
@@ -1,164 +1,590 @@
 import datetime
 import os
-from flask import jsonify
+import threading
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
 import cv2
-from PIL import Image
 
-from src.utils.helpers import draw_detections
+from src.utils.helpers import decode_image, draw_boxes, encode_jpeg
+from src.services.application import ModelNotReady
+from src.services.detections import count_classes, extract_boxes, summarize_detections, to_detections
+from src.services.ingest import check_ingest, get_ingest, open_video_capture
+from src.services.metrics import stage
+from src.services.inference_pool import InferencePoolBusy, InferenceTimeout
+from src.services.sampling import FrameSampler, compute_frame_interval
+from src.services.gating import SceneChangeGate
+from src.services.tiling import tiled_inference
+from src.services.tracking import IoUTracker, MotionEstimator, propagate_detections
+from src.services.writer import WriteBatch, get_output_extension
 
-def process_image(app_context, image):
+_decode_executor: Optional[ThreadPoolExecutor] = None
+_decode_executor_lock = threading.Lock()
+
+class AnalysisCancelled(Exception):
+    pass
+
+def _original_extension(filename: str) -> str:
+    extension = os.path.splitext(filename or '')[1].lower()
+    if len(extension) > 1 and extension[1:].isalnum():
+        return extension
+    return '.jpg'
+
+def _original_image(app_context, image, image_bytes: bytes, filename: str, timestamp: str):
+    """
+    Path and bytes the uploaded original is saved as.
+    """
+    uploads_dir = app_context.get_uploads_dir()
+    if app_context.get_store_original_bytes():
+        return os.path.join(uploads_dir, f'{timestamp}_original{_original_extension(filename)}'), image_bytes
+    with stage('encode'):
+        original_bytes = encode_jpeg(image, app_context.get_image_jpeg_quality())
+    return os.path.join(uploads_dir, f'{timestamp}_original.jpg'), original_bytes
+
+def _result_image_path(app_context, timestamp: str):
+    output_format = app_context.get_output_format()
+    if output_format == 'none':
+        return None
+    return os.path.join(app_context.get_results_dir(), f'{timestamp}_result{get_output_extension(output_format)}')
+
+def _image_tiling(app_context, image):
+    tiling = app_context.get_tiling_params()
+    if tiling and max(image.shape[:2]) < tiling['min_size']:
+        return None
+    return tiling
+
+def _image_cache_key(app_context, cache, image_bytes: bytes, tiling):
+    if not cache:
+        return None
+    # Cached results are only valid for the tiling and output settings they were made with
+    return cache.make_key(
+        image_bytes,
+        f'{app_context.get_model_identity()}|output={app_context.get_output_format()}'
+        f':{app_context.get_output_quality()}:{app_context.get_output_thumbnail_width()}'
+        + (f"|tiles={tiling['tile_size']}:{tiling['overlap']}:{tiling['full_image']}" if tiling else '')
+    )
+
+def _tiled_inference(app_context, model, image, tiling):
+    return tiled_inference(
+        model, image, tiling['tile_size'], tiling['overlap'],
+        batch_size=tiling['batch_size'], full_image=tiling['full_image'], **app_context.get_inference_params()
+    )
+
+def _extract_detections(model, results):
+    """
+    Detection dicts, box array and per-class summary of model results. The
+    arrays are pulled from the results once and shared by serialization,
+    counting and drawing.
+    """
+    xyxy, conf, cls = extract_boxes(results)
+    return to_detections(model.names, xyxy, conf, cls), xyxy, count_classes(model.names, cls)
+
+def _write_image_result(app_context, writer, writes, image, xyxy, result_path, detections,
+                        cache=None, cache_key=None):
+    """
+    Draw the detections and queue the result image on the writer; the
+    result is cached once its bytes are encoded.
+    """
+    def cache_result(result_bytes):
+        cache.put(cache_key, detections, result_bytes)
+    
+    if result_path:
+        # The decoded buffer is not needed after inference, so boxes are
+        # drawn on it directly and it is handed to the writer
+        with stage('draw'):
+            result_image = draw_boxes(image, xyxy)
+        writer.write(
+            writes, result_path, image=result_image,
+            output_format=app_context.get_output_format(), quality=app_context.get_output_quality(),
+            thumbnail_width=app_context.get_output_thumbnail_width(),
+            on_done=cache_result if cache else None
+        )
+    elif cache:
+        cache_result(b'')
+
+def _image_history_entry(image_path: str, result_path, detections, summary):
+    return {
+        'timestamp': datetime.datetime.now().isoformat(),
+        'type': 'image_upload',
+        'original_image': image_path,
+        'result_image': result_path,
+        'detections': detections,
+        'summary': summary
+    }
+
+def process_image(app_context, image_bytes: bytes, filename: str = ''):
     try:
         model = app_context.get_model()
-        uploads_dir = app_context.get_uploads_dir()
-        results_dir = app_context.get_results_dir()
 
-        if image.mode == 'RGBA':
-            image = image.convert('RGB')
+        # One BGR buffer is shared by inference, drawing and encoding
+        with stage('decode'):
+            image = decode_image(image_bytes)
+        if image is None:
+            return {'error': 'Could not decode image'}, 400
         
         timestamp = app_context.get_timestamp()
-        image_path = os.path.join(uploads_dir, f'{timestamp}_original.jpg')
-        image.save(image_path, 'JPEG', quality=95)
-
-        results = model(image)
-        
-        result_image = draw_detections(image, results)
-        
-        result_path = os.path.join(results_dir, f'{timestamp}_result.jpg')
-        
-        if result_image.mode == 'RGBA':
-            result_image = result_image.convert('RGB')
-        
-        result_image.save(result_path, 'JPEG', quality=95)
-        
-        detections = []
-        
-        for result in results:
-            boxes = result.boxes
-            for box in boxes:
-                cls = int(box.cls[0])
-                conf = float(box.conf[0])
-                class_name = model.names[cls]
-                
-                detections.append({
-                    'class': class_name,
-                    'confidence': conf,
-                    'bbox': box.xyxy[0].tolist()
-                })
-        
-        history = app_context.get_history()
-        history_entry = {
-            'id': len(history) + 1,
-            'timestamp': datetime.datetime.now().isoformat(),
-            'type': 'image_upload',
-            'original_image': image_path,
-            'result_image': result_path,
-            'detections': detections,
-            'summary': {d['class']: sum(1 for d in detections if d['class'] == d['class']) for d in detections}
-        }
-        history.append(history_entry)
-        app_context.save_history(history)
+        image_path, original_bytes = _original_image(app_context, image, image_bytes, filename, timestamp)
+        result_path = _result_image_path(app_context, timestamp)
+        
+        writer = app_context.get_image_writer()
+        writes = WriteBatch()
+        tiling = _image_tiling(app_context, image)
+        
+        cache = app_context.get_result_cache()
+        cache_key = _image_cache_key(app_context, cache, image_bytes, tiling)
+        cached = cache.get(cache_key) if cache else None
+        
+        if cached:
+            detections = cached['detections']
+            summary = summarize_detections(detections)
+            if result_path:
+                writer.write(writes, result_path, data=cached['result_image'])
+        else:
+            with stage('inference'):
+                if tiling:
+                    results = _tiled_inference(app_context, model, image, tiling)
+                else:
+                    results = model(image, **app_context.get_inference_params())
+            
+            detections, xyxy, summary = _extract_detections(model, results)
+            _write_image_result(app_context, writer, writes, image, xyxy, result_path, detections,
+                                cache=cache, cache_key=cache_key)
+        
+        # The original is saved while the result image is encoded; both are
+        # on disk before the history entry points at them
+        with stage('write'):
+            with open(image_path, 'wb') as f:
+                f.write(original_bytes)
+        with stage('flush'):
+            writes.wait()
+        
+        app_context.add_history_entry(_image_history_entry(image_path, result_path, detections, summary))
 
         return {'success': True}
 
+    except (InferencePoolBusy, ModelNotReady) as e:
+        return {'error': str(e)}, 503
+    except InferenceTimeout as e:
+        return {'error': str(e)}, 504
     except Exception as e:
         print(str(e))
         return {'error': str(e)}, 500
 
-def process_video(app_context, video_path: str):
-    try:
-        model = app_context.get_model()
-        uploads_dir = app_context.get_uploads_dir()
-        results_dir = app_context.get_results_dir()
-        frame_interval_seconds = app_context.get_video_frame_interval()
+def _get_decode_executor(workers: int) -> ThreadPoolExecutor:
+    global _decode_executor
+    if _decode_executor is None:
+        with _decode_executor_lock:
+            if _decode_executor is None:
+                _decode_executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='batch-decode')
+    return _decode_executor
+
+def _process_image_batch_chunk(app_context, model, chunk, batch_timestamp, writer, writes, cache):
+    """
+    Finish one inference batch of a batch upload: cache hits and tiled images
+    are handled one by one, the rest go to the model in a single call.
+    Yields ``(index, result, entry)`` in upload order; ``entry`` is None for
+    failed images.
+    """
+    prepared = []
+    to_infer = []
+    for index, filename, image_bytes, decoded in chunk:
+        image = decoded.result()
+        if image is None:
+            prepared.append((index, filename, None))
+            continue
+        
+        timestamp = f'{batch_timestamp}_{index:04d}'
+        image_path, original_bytes = _original_image(app_context, image, image_bytes, filename, timestamp)
+        with stage('write'):
+            with open(image_path, 'wb') as f:
+                f.write(original_bytes)
+        result_path = _result_image_path(app_context, timestamp)
+        tiling = _image_tiling(app_context, image)
+        cache_key = _image_cache_key(app_context, cache, image_bytes, tiling)
+        cached = cache.get(cache_key) if cache else None
+        
+        item = {
+            'image': image, 'image_path': image_path, 'result_path': result_path,
+            'tiling': tiling, 'cache_key': cache_key, 'cached': cached
+        }
+        if not cached and not tiling:
+            to_infer.append(item)
+        prepared.append((index, filename, item))
+    
+    # Same-shape images are stacked by the model (or split per frame by the inference pool)
+    if to_infer:
+        try:
+            with stage('inference'):
+                batch_results = model([item['image'] for item in to_infer], **app_context.get_inference_params())
+        except (InferencePoolBusy, InferenceTimeout) as e:
+            for item in to_infer:
+                item['error'] = str(e)
+        else:
+            for item, result in zip(to_infer, batch_results):
+                item['results'] = [result]
+    
+    for index, filename, item in prepared:
+        if item is None:
+            yield index, {'index': index, 'filename': filename, 'success': False,
+                          'error': 'Could not decode image'}, None
+            continue
+        try:
+            if item.get('error'):
+                raise RuntimeError(item['error'])
+            result_path = item['result_path']
+            if item['cached']:
+                detections = item['cached']['detections']
+                summary = summarize_detections(detections)
+                if result_path:
+                    writer.write(writes, result_path, data=item['cached']['result_image'])
+            else:
+                results = item.get('results')
+                if results is None:
+                    with stage('inference'):
+                        results = _tiled_inference(app_context, model, item['image'], item['tiling'])
+                detections, xyxy, summary = _extract_detections(model, results)
+                _write_image_result(app_context, writer, writes, item['image'], xyxy, result_path,
+                                    detections, cache=cache, cache_key=item['cache_key'])
+        except Exception as e:
+            yield index, {'index': index, 'filename': filename, 'success': False, 'error': str(e)}, None
+            continue
+        
+        entry = _image_history_entry(item['image_path'], result_path, detections, summary)
+        yield index, {
+            'index': index,
+            'filename': filename,
+            'success': True,
+            'detections': detections,
+            'summary': summary,
+            'result_image': result_path
+        }, entry
+
+def process_image_batch(app_context, uploads):
+    """
+    Detect objects in many images, given as ``(filename, bytes)`` pairs.
 
-        cap = cv2.VideoCapture(video_path)
-        if not cap.isOpened():
-            return jsonify({'error': 'Could not open video file'}), 500
+    Images are decoded on a thread pool a couple of batches ahead of the
+    model, which sees ``batch.inference_batch_size`` images per call. A
+    result dict is yielded per image as soon as its batch is done, in upload
+    order. Once every result image is on disk, all history entries are
+    written in one transaction and a final ``{'done': True, ...}`` dict
+    with the counts and history ids is yielded.
+
+    Raises ``ModelNotReady`` before anything is yielded if the model is
+    still loading.
+    """
+    model = app_context.get_model()
+    batch_size = app_context.get_batch_inference_size()
+    executor = _get_decode_executor(app_context.get_batch_decode_workers())
+    writer = app_context.get_image_writer()
+    writes = WriteBatch()
+    cache = app_context.get_result_cache()
+    batch_timestamp = app_context.get_timestamp()
+    
+    def decode(image_bytes):
+        with stage('decode'):
+            return decode_image(image_bytes)
+    
+    # Decoded images are held for at most two batches, so memory does not
+    # grow with the number of uploads
+    pending = deque()
+    upload_iter = enumerate(uploads)
+    
+    def fill():
+        while len(pending) < 2 * batch_size:
+            item = next(upload_iter, None)
+            if item is None:
+                return
+            index, (filename, image_bytes) = item
+            pending.append((index, filename, image_bytes, executor.submit(decode, image_bytes)))
+    
+    entries = []
+    failed = 0
+    fill()
+    while pending:
+        chunk = [pending.popleft() for _ in range(min(batch_size, len(pending)))]
+        fill()
+        for _, result, entry in _process_image_batch_chunk(
+                app_context, model, chunk, batch_timestamp, writer, writes, cache):
+            if entry is None:
+                failed += 1
+            else:
+                entries.append(entry)
+            yield result
+    
+    with stage('flush'):
+        writes.wait()
+    stored = app_context.add_history_entries(entries) if entries else []
+    yield {
+        'done': True,
+        'processed': len(stored),
+        'failed': failed,
+        'history_ids': [entry['id'] for entry in stored]
+    }
+
+class _VideoState:
+    """
+    State carried across inference batches of one video: collected results,
+    the tracker and the keyframe-skip bookkeeping.
+    """
+    
+    def __init__(self, app_context):
+        self.frame_results = []
+        # Per-class detection counts over all frames, and of the last frame
+        self.class_counts = Counter()
+        self.last_counts = {}
+        self.last_detections = []
+        self.tracker = None
+        self.motion = None
+        self.motion_threshold = app_context.get_tracking_motion_threshold()
+        self.max_skip_frames = app_context.get_tracking_max_skip_frames()
+        self.consecutive_skips = 0
+        self.inferences_skipped = 0
+        self.gate = None
+        self.writes = WriteBatch()
+        
+        if app_context.get_gating_enabled():
+            self.gate = SceneChangeGate(
+                threshold=app_context.get_gating_threshold(),
+                width=app_context.get_gating_width()
+            )
+        if app_context.get_tracking_enabled():
+            self.tracker = IoUTracker(
+                iou_threshold=app_context.get_tracking_iou_threshold(),
+                max_age=app_context.get_tracking_max_age()
+            )
+            if app_context.get_tracking_skip_inference() and self.max_skip_frames > 0:
+                self.motion = MotionEstimator()
+    
+    def plan_frame(self, frame):
+        """
+        Decide how a sampled frame gets its detections: ``('reuse', None)``
+        when the scene has not changed, ``('flow', flow)`` to carry the
+        previous boxes along the optical flow, or ``('infer', None)`` for a
+        full model pass.
+        """
+        if self.gate is not None and self.gate.check(frame):
+            return 'reuse', None
         
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        if self.motion is not None:
+            flow = self.motion.estimate(frame)
+            if flow is not None and self.consecutive_skips < self.max_skip_frames and self.is_still(flow):
+                self.consecutive_skips += 1
+                return 'flow', flow
+            self.consecutive_skips = 0
+        if self.gate is not None:
+            # Only frames with fresh detections become the gate's reference
+            self.gate.update_reference()
+        return 'infer', None
+    
+    def is_still(self, flow) -> bool:
+        """
+        Whether the scene and every box of the last detections moved less
+        than the motion threshold: a single moving object barely shifts the
+        global median.
+        """
+        boxes = [d['bbox'] for d in self.last_detections]
+        return max(flow.motion, flow.max_box_motion(boxes)) < self.motion_threshold
+
+def _process_frame_batch(app_context, model, batch, state):
+    """
+    Run a single model call over the frames of a batch that need inference,
+    fill in the rest from the previous frame (reused as is or carried along
+    the optical flow), and record the per-frame results in frame order.
+    """
+    results_dir = app_context.get_results_dir()
+    infer_frames = [frame for _, frame, (action, _) in batch if action == 'infer']
+    
+    # Raw BGR arrays go straight to the model, one call for the whole batch
+    with stage('inference'):
+        batch_results = iter(model(infer_frames, **app_context.get_inference_params()) if infer_frames else ())
+    
+    writer = app_context.get_image_writer()
+    output_format = app_context.get_output_format()
+    output_quality = app_context.get_output_quality()
+    only_with_detections = app_context.get_output_only_with_detections()
+    sample_frames = app_context.get_report_sample_frames()
+    
+    for frame_number, frame, (action, flow) in batch:
+        if action == 'flow' and not state.is_still(flow):
+            # Planned before the boxes of the previous frame were known, and
+            # one of them moves: this frame gets a model pass of its own
+            action = 'infer'
+            with stage('inference'):
+                late_results = model([frame], **app_context.get_inference_params())
+            detections, boxes, state.last_counts = _extract_detections(model, late_results)
+        elif action == 'infer':
+            detections, boxes, state.last_counts = _extract_detections(model, [next(batch_results)])
+        elif action == 'flow':
+            # Boxes that left the frame are dropped, so the counts follow
+            detections = propagate_detections(state.last_detections, flow)
+            boxes = [d['bbox'] for d in detections]
+            if len(detections) != len(state.last_detections):
+                state.last_counts = summarize_detections(detections)
+            state.inferences_skipped += 1
+        else:
+            detections = [{k: v for k, v in d.items() if k != 'track_id'} for d in state.last_detections]
+            boxes = [d['bbox'] for d in detections]
         
-        frame_interval = int(fps * frame_interval_seconds)
+        if state.tracker:
+            with stage('tracking'):
+                state.tracker.update(detections)
+        state.last_detections = detections
+        state.class_counts.update(state.last_counts)
         
-        frame_results = []
-        all_detections = []
+        result_timestamp = app_context.get_timestamp()
+        write_result = output_format != 'none' and (detections or not only_with_detections)
+        # The PDF report shows the first frames, so their thumbnails are made now
+        write_thumbnail = len(state.frame_results) < sample_frames
         
-        frame_count = 0
+        result_path = None
+        if write_result or write_thumbnail:
+            # The frame is not used after this point, so it is drawn on in place
+            # and handed to the writer pool
+            with stage('draw'):
+                result_image = draw_boxes(frame, boxes)
+            if write_result:
+                result_path = os.path.join(
+                    results_dir, f'{result_timestamp}_video_frame{get_output_extension(output_format)}'
+                )
+                writer.write(state.writes, result_path, image=result_image, output_format=output_format,
+                             quality=output_quality, thumbnail_width=app_context.get_output_thumbnail_width())
         
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            
-            if frame_count % frame_interval == 0:
-                rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                image = Image.fromarray(rgb_frame)
-                
-                results = model(image)
-                
-                result_image = draw_detections(image, results)
-                
-                result_timestamp = app_context.get_timestamp()
-                result_path = os.path.join(results_dir, f'{result_timestamp}_video_frame.jpg')
-                
-                if result_image.mode == 'RGBA':
-                    result_image = result_image.convert('RGB')
-                
-                result_image.save(result_path, 'JPEG', quality=95)
-                
-                detections = []
-                
-                for result in results:
-                    boxes = result.boxes
-                    for box in boxes:
-                        cls = int(box.cls[0])
-                        conf = float(box.conf[0])
-                        class_name = model.names[cls]
-                        
-                        detection_data = {
-                            'class': class_name,
-                            'confidence': conf,
-                            'bbox': box.xyxy[0].tolist()
-                        }
-                        detections.append(detection_data)
-                        all_detections.append(detection_data)
-                
-                frame_results.append({
-                    'frame_number': frame_count,
-                    'timestamp': result_timestamp,
-                    'result_image': result_path,
-                    'detections': detections
-                })
-            
-            frame_count += 1
-        
-        cap.release()
-        
-        summary = {}
-        for detection in all_detections:
-            class_name = detection['class']
-            if class_name not in summary:
-                summary[class_name] = 0
-            summary[class_name] += 1
-        
-        history = app_context.get_history()
-        history_entry = {
-            'id': len(history) + 1,
-            'timestamp': datetime.datetime.now().isoformat(),
-            'type': 'video_analysis',
-            'original_video': video_path,
-            'frame_results': frame_results,
-            'summary': summary
+        frame_result = {
+            'frame_number': frame_number,
+            'timestamp': result_timestamp,
+            'result_image': result_path
         }
-        history.append(history_entry)
-        app_context.save_history(history)
+        if action == 'flow':
+            frame_result['propagated'] = True
+        elif action == 'reuse':
+            frame_result['reused'] = True
         
-        return jsonify({
-            'success': True,
-            'frame_results': frame_results,
-            'summary': summary
-        })
+        if write_thumbnail:
+            thumbnail_path = os.path.join(results_dir, f'{result_timestamp}_video_frame_thumb.jpg')
+            writer.write(state.writes, thumbnail_path, image=result_image, output_format='thumbnail',
+                         quality=output_quality, thumbnail_width=app_context.get_report_thumbnail_width())
+            frame_result['thumbnail'] = thumbnail_path
         
-    except Exception as e:
-        print(str(e))
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        frame_result['detections'] = detections
+        state.frame_results.append(frame_result)
+
+def _discard_frame_images(state):
+    # Nothing is recorded for a cancelled or failed analysis, so no history
+    # entry would ever point at the images it already wrote
+    try:
+        state.writes.wait()
+    except Exception:
+        pass
+    for frame_result in state.frame_results:
+        for path in (frame_result.get('result_image'), frame_result.get('thumbnail')):
+            if path and os.path.exists(path):
+                os.remove(path)
+
+def analyze_video(app_context, video_path: str, model=None, progress_callback=None,
+                  frame_callback=None, cancel_event: Optional[threading.Event] = None):
+    """
+    Run detection over the sampled frames of a video and append the result to
+    the request history.
+
+    ``progress_callback(processed_frames, expected_frames)`` is called after
+    every inference batch, and ``frame_callback(frame_result)`` for each frame
+    of the batch; its result image may still be in the writer queue. Setting
+    ``cancel_event`` stops the analysis before the next frame with
+    ``AnalysisCancelled`` and nothing is recorded. Returns the history entry
+    that was written.
+    """
+    if model is None:
+        model = app_context.get_model()
+    batch_size = app_context.get_video_batch_size()
+
+    # Set while the video is still being uploaded
+    ingest = get_ingest(video_path)
+    cap = open_video_capture(video_path, stall_timeout=app_context.get_upload_stall_timeout(),
+                             cancel_event=cancel_event)
+    if not cap.isOpened():
+        raise ValueError('Could not open video file')
+    
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    duration = total_frames / fps if fps > 0 else 0
+    
+    if total_frames > 0:
+        frame_interval_seconds = compute_frame_interval(app_context, duration)
+    else:
+        # Length is unknown while the upload is still streaming in
+        frame_interval_seconds = app_context.get_video_base_frame_interval()
+    frame_interval = max(1, int(round(fps * frame_interval_seconds)))
+    expected_frames = -(-total_frames // frame_interval) if total_frames > 0 else 0
+    
+    sampler = FrameSampler(
+        cap,
+        frame_interval,
+        mode=app_context.get_video_sampling_mode(),
+        seek_min_gap=app_context.get_video_seek_min_gap_frames()
+    )
+    
+    state = _VideoState(app_context)
+    batch = []
+    
+    def run_batch():
+        first = len(state.frame_results)
+        _process_frame_batch(app_context, model, batch, state)
+        if frame_callback:
+            for frame_result in state.frame_results[first:]:
+                frame_callback(frame_result)
+        if progress_callback:
+            progress_callback(len(state.frame_results), expected_frames)
+    
+    frames = iter(sampler)
+    try:
+        try:
+            while True:
+                if cancel_event is not None and cancel_event.is_set():
+                    raise AnalysisCancelled('Video analysis was cancelled')
+                with stage('video_decode'):
+                    sampled = next(frames, None)
+                if sampled is None:
+                    break
+                frame_number, frame = sampled
+                with stage('plan'):
+                    plan = state.plan_frame(frame)
+                batch.append((frame_number, frame, plan))
+                if len(batch) >= batch_size:
+                    run_batch()
+                    batch = []
+        finally:
+            cap.release()
+        
+        if batch:
+            run_batch()
+        # Flush: every result image of the job is on disk before it is recorded
+        with stage('flush'):
+            state.writes.wait()
+        # A cancelled streamed upload ends the decode like a finished one
+        if cancel_event is not None and cancel_event.is_set():
+            raise AnalysisCancelled('Video analysis was cancelled')
+        if ingest is not None:
+            check_ingest(ingest)
+    except Exception:
+        _discard_frame_images(state)
+        raise
+    if progress_callback:
+        progress_callback(len(state.frame_results), len(state.frame_results))
+    
+    summary = dict(state.class_counts)
+    
+    entry = {
+        'timestamp': datetime.datetime.now().isoformat(),
+        'type': 'video_analysis',
+        'original_video': video_path,
+        'frame_results': state.frame_results,
+        'summary': summary
+    }
+    if state.tracker:
+        entry['unique_objects'] = state.tracker.get_unique_counts()
+        entry['inference_skipped_frames'] = state.inferences_skipped
+    if state.gate:
+        entry['inference_reused_frames'] = state.gate.reused_frames
+    
+    return app_context.add_history_entry(entry)
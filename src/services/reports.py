@@ -0,0 +1,68 @@
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from src.services.frame_store import open_frame_columns
+from src.services.metrics import stage
+from src.utils.helpers import create_pdf
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_content_version(entry: Dict[str, Any]) -> str:
+    """
+    Short hash of everything the report shows, so a changed entry gets a new PDF.
+    """
+    payload = json.dumps(entry, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def get_video_report(app_context, video_entry: Dict[str, Any]) -> str:
+    """
+    Return the PDF report of a video analysis, rendering it only when no PDF
+    exists for this video id and content version.
+    """
+    cache_dir = app_context.get_pdf_cache_dir()
+    os.makedirs(cache_dir, exist_ok=True)
+    pdf_path = os.path.join(
+        cache_dir,
+        f"video_analysis_report_{video_entry['id']}_{get_content_version(video_entry)}.pdf"
+    )
+    if os.path.exists(pdf_path):
+        return pdf_path
+
+    # Render next to the final name and rename, so concurrent requests never
+    # serve a half-written file
+    tmp_path = f'{pdf_path}.{threading.get_ident()}.tmp'
+    try:
+        with stage('pdf_render'):
+            create_pdf(tmp_path, video_entry, open_frame_columns(video_entry),
+                       sample_count=app_context.get_report_sample_frames())
+        os.replace(tmp_path, pdf_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return pdf_path
+
+
+def _get_executor(workers: int) -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='pdf-report')
+    return _executor
+
+
+def get_video_reports(app_context, video_entries: List[Dict[str, Any]]) -> List[str]:
+    """
+    Render (or fetch from the cache) the reports of several videos on the
+    report worker pool. Paths are returned in the order of ``video_entries``.
+    """
+    executor = _get_executor(app_context.get_report_workers())
+    futures = [executor.submit(get_video_report, app_context, entry) for entry in video_entries]
+    return [future.result() for future in futures]
@@ -0,0 +1,305 @@
+import argparse
+import datetime
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import cv2
+
+from src.services.frame_store import update_frame_paths
+from src.services.ingest import IMAGE_EXTENSIONS
+from src.utils.helpers import encode_jpeg, make_thumbnail
+
+THUMBNAIL_SUFFIX = '_thumb.jpg'
+
+# Entries are recorded after the files they point at, so only entries newer
+# than the oldest touched file need their references checked; the margin
+# covers clock changes
+REFERENCE_MARGIN = datetime.timedelta(days=1)
+
+# History fields holding a single artifact path
+PATH_FIELDS = ('original_image', 'result_image', 'original_video')
+
+
+class RetentionPolicy:
+    """
+    Age and size budget of one artifact directory. A limit of 0 is off.
+
+    Images older than ``compact_after_days`` are replaced by JPEG
+    thumbnails, files older than ``delete_after_days`` are deleted, and the
+    oldest files are deleted while the directory is over ``max_size_mb``.
+    """
+
+    def __init__(self, name: str, path: str, compact_after_days: float = 0,
+                 delete_after_days: float = 0, max_size_mb: float = 0):
+        self.name = name
+        self.path = path
+        self.compact_after = compact_after_days * 86400
+        self.delete_after = delete_after_days * 86400
+        self.max_bytes = int(max_size_mb * 1024 * 1024)
+
+
+def rewrite_entry_paths(entry: Dict[str, Any], mapping: Dict[str, Optional[str]]) -> bool:
+    """
+    Point the file paths of a history entry at their new location, or clear
+    them when the file was deleted. Returns whether the entry changed.
+    """
+    changed = False
+    for field in PATH_FIELDS:
+        value = entry.get(field)
+        if value and os.path.normpath(value) in mapping:
+            entry[field] = mapping[os.path.normpath(value)]
+            changed = True
+    # Entries written before the frame store keep their frames inline
+    for frame in entry.get('frame_results') or []:
+        for field in ('result_image', 'thumbnail'):
+            value = frame.get(field)
+            if value and os.path.normpath(value) in mapping:
+                frame[field] = mapping[os.path.normpath(value)]
+                changed = True
+    return changed
+
+
+class RetentionCompactor:
+    """
+    Background thread keeping artifact directories within their budgets.
+
+    Each run scans the directories, makes thumbnails of old images, picks
+    files to delete, and points the history at the thumbnails (or clears
+    the references to deleted files) before the old files are removed, so
+    the history never refers to a file that is gone. Files younger than
+    ``grace_seconds`` and paths returned by ``protected`` (videos of
+    unfinished jobs) are left alone.
+    """
+
+    def __init__(self, app_context, policies: List[RetentionPolicy], interval_seconds: float = 3600,
+                 grace_seconds: float = 3600, thumbnail_width: int = 320, thumbnail_quality: int = 85,
+                 protected: Optional[Callable[[], Iterable[str]]] = None):
+        self.app_context = app_context
+        self.policies = policies
+        self.interval_seconds = max(1.0, interval_seconds)
+        self.grace_seconds = grace_seconds
+        self.thumbnail_width = thumbnail_width
+        self.thumbnail_quality = thumbnail_quality
+        self.protected = protected
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._run_lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def start(self) -> threading.Thread:
+        thread = threading.Thread(target=self._loop, name='retention-compactor', daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def get_stats(self) -> Dict[str, Dict[str, int]]:
+        return {name: dict(stats) for name, stats in self._stats.items()}
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Retention run failed: {e}")
+            self._stop.wait(self.interval_seconds)
+
+    @staticmethod
+    def _scan(path: str) -> List[Dict[str, Any]]:
+        files = []
+        for root, _, names in os.walk(path):
+            for name in names:
+                file_path = os.path.join(root, name)
+                try:
+                    stat = os.stat(file_path)
+                except OSError:
+                    continue
+                files.append({'path': file_path, 'source': os.path.normpath(file_path),
+                              'size': stat.st_size, 'mtime': stat.st_mtime})
+        files.sort(key=lambda f: f['mtime'])
+        return files
+
+    def _compact(self, record: Dict[str, Any], dry_run: bool) -> Tuple[Optional[str], bool]:
+        """
+        Make a thumbnail of an image file. Returns its path (None if the file
+        cannot be compacted) and whether it was newly written.
+        """
+        path = record['path']
+        if path.endswith(THUMBNAIL_SUFFIX) or os.path.splitext(path)[1].lower() not in IMAGE_EXTENSIONS:
+            return None, False
+        thumbnail_path = os.path.splitext(path)[0] + THUMBNAIL_SUFFIX
+        # Report thumbnails of video frames already sit under this name
+        if os.path.exists(thumbnail_path):
+            return thumbnail_path, False
+        if dry_run:
+            return thumbnail_path, True
+
+        image = cv2.imread(path, cv2.IMREAD_COLOR)
+        if image is None:
+            return None, False
+        if image.shape[1] > self.thumbnail_width:
+            image = make_thumbnail(image, self.thumbnail_width)
+        tmp_path = f'{thumbnail_path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(encode_jpeg(image, self.thumbnail_quality))
+        # The thumbnail keeps the age of the file it replaces
+        os.utime(tmp_path, (record['mtime'], record['mtime']))
+        os.replace(tmp_path, thumbnail_path)
+        return thumbnail_path, True
+
+    def _plan(self, policy: RetentionPolicy, now: float, protected: set,
+              mapping: Dict[str, Optional[str]], to_remove: List[str], dry_run: bool) -> Dict[str, int]:
+        files = self._scan(policy.path)
+        total = sum(f['size'] for f in files)
+        stats = {'files': len(files), 'bytes': total, 'compacted': 0, 'deleted': 0, 'freed_bytes': 0}
+        kept = []
+        # Recent and protected files count towards the budget but are never removed
+        untouchable = 0
+
+        for record in files:
+            age = now - record['mtime']
+            if age < self.grace_seconds or record['source'] in protected:
+                untouchable += 1
+                continue
+            if policy.delete_after and age > policy.delete_after:
+                mapping[record['source']] = None
+                to_remove.append(record['path'])
+                total -= record['size']
+                stats['deleted'] += 1
+                stats['freed_bytes'] += record['size']
+                continue
+            if policy.compact_after and age > policy.compact_after:
+                thumbnail_path, created = self._compact(record, dry_run)
+                if thumbnail_path is not None:
+                    mapping[record['source']] = thumbnail_path
+                    to_remove.append(record['path'])
+                    total -= record['size']
+                    stats['compacted'] += 1
+                    stats['freed_bytes'] += record['size']
+                    if not created:
+                        # The existing thumbnail was scanned as a file of its own
+                        continue
+                    size = os.path.getsize(thumbnail_path) if os.path.exists(thumbnail_path) else 0
+                    total += size
+                    stats['freed_bytes'] -= size
+                    record = dict(record, path=thumbnail_path, size=size)
+            kept.append(record)
+
+        # Over the size budget: the oldest files go first
+        deleted_by_age = stats['deleted']
+        for record in kept:
+            if not policy.max_bytes or total <= policy.max_bytes:
+                break
+            if record['path'] in to_remove:
+                continue
+            mapping[record['source']] = None
+            to_remove.append(record['path'])
+            total -= record['size']
+            stats['deleted'] += 1
+            stats['freed_bytes'] += record['size']
+
+        stats['files'] = untouchable + len(kept) - (stats['deleted'] - deleted_by_age)
+        stats['bytes'] = total
+        return stats
+
+    def _update_references(self, mapping: Dict[str, Optional[str]], since: float) -> int:
+        # A file compacted and then deleted in the same run leaves no thumbnail
+        for source, target in list(mapping.items()):
+            if target is not None and mapping.get(os.path.normpath(target), target) is None:
+                mapping[source] = None
+
+        store = self.app_context.get_history_store()
+        start = (datetime.datetime.fromtimestamp(since) - REFERENCE_MARGIN).isoformat()
+        changed = []
+        for entry in store.query(start=start):
+            if entry.get('frame_store') and os.path.isdir(entry['frame_store']):
+                update_frame_paths(entry['frame_store'], mapping)
+            if rewrite_entry_paths(entry, mapping):
+                changed.append(entry)
+        if changed:
+            store.update_many(changed)
+        return len(changed)
+
+    def run_once(self, dry_run: bool = False) -> Dict[str, Dict[str, int]]:
+        """
+        Enforce every policy once. With ``dry_run`` nothing is changed and
+        the result tells what would be compacted and deleted.
+        """
+        with self._run_lock:
+            now = time.time()
+            protected = {os.path.normpath(path) for path in (self.protected() if self.protected else [])}
+            mapping: Dict[str, Optional[str]] = {}
+            to_remove: List[str] = []
+            stats = {}
+            for policy in self.policies:
+                if os.path.isdir(policy.path):
+                    stats[policy.name] = self._plan(policy, now, protected, mapping, to_remove, dry_run)
+            if dry_run:
+                return stats
+
+            if mapping:
+                since = min(os.path.getmtime(path) if os.path.exists(path) else now for path in to_remove)
+                updated = self._update_references(mapping, since)
+                print(f"Retention: compacted or removed {len(to_remove)} files, updated {updated} history entries")
+            for path in to_remove:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            for policy in self.policies:
+                self._remove_empty_dirs(policy.path, now - self.grace_seconds)
+            self._stats = stats
+            return stats
+
+    @staticmethod
+    def _remove_empty_dirs(path: str, before: float) -> None:
+        # Recently changed directories are kept, like today's shard between uploads
+        for root, _, _ in os.walk(path, topdown=False):
+            try:
+                if root != path and not os.listdir(root) and os.path.getmtime(root) < before:
+                    os.rmdir(root)
+            except OSError:
+                pass
+
+
+def create_retention_compactor(app_context, protected: Optional[Callable[[], Iterable[str]]] = None
+                               ) -> RetentionCompactor:
+    config = app_context.config
+    directories = {
+        'uploads': config.get_uploads_dir(),
+        'results': config.get_results_dir(),
+        'reports': config.get_reports_dir()
+    }
+    policies = [
+        RetentionPolicy(name, path, **config.get_retention_policy(name))
+        for name, path in directories.items()
+    ]
+    return RetentionCompactor(
+        app_context,
+        policies,
+        interval_seconds=config.get_retention_interval_minutes() * 60,
+        grace_seconds=config.get_retention_grace_minutes() * 60,
+        thumbnail_width=config.get_retention_thumbnail_width(),
+        thumbnail_quality=config.get_retention_thumbnail_quality(),
+        protected=protected
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Apply the artifact retention budgets once')
+    parser.add_argument('--config', default='config.yaml')
+    parser.add_argument('--dry-run', action='store_true', help='only report what would be compacted and deleted')
+    args = parser.parse_args()
+
+    from src.config.config import Config
+    from src.services.application import ApplicationContext
+
+    compactor = create_retention_compactor(ApplicationContext(Config(args.config)))
+    print(json.dumps(compactor.run_once(dry_run=args.dry_run), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+from typing import Iterator, Tuple
+
+import cv2
+import numpy as np
+
+SAMPLING_MODES = ('auto', 'grab', 'seek')
+
+
+def compute_frame_interval(app_context, duration_seconds: float) -> float:
+    """
+    Pick the sampling interval (in seconds) for a video of the given duration.
+
+    Short videos are sampled at the minimum interval, long videos at the base
+    interval, and anything in between is interpolated linearly.
+    """
+    base_interval = float(app_context.get_video_base_frame_interval())
+    min_interval = float(app_context.get_video_min_frame_interval())
+    short_duration = float(app_context.get_max_short_video_duration())
+    long_duration = float(app_context.get_min_long_video_duration())
+
+    if duration_seconds <= short_duration:
+        return min_interval
+    if duration_seconds >= long_duration or long_duration <= short_duration:
+        return base_interval
+
+    ratio = (duration_seconds - short_duration) / (long_duration - short_duration)
+    return min_interval + (base_interval - min_interval) * ratio
+
+
+class FrameSampler:
+    """
+    Yield every ``frame_interval``-th frame of an opened ``cv2.VideoCapture``
+    without fully decoding the frames in between.
+
+    ``grab`` mode advances with ``cap.grab()`` and only retrieves the frames
+    that are kept. ``seek`` mode jumps straight to each sampled frame with
+    ``CAP_PROP_POS_FRAMES``, which is cheaper once the gap spans keyframes.
+    ``auto`` picks ``seek`` when the gap is at least ``seek_min_gap`` frames
+    and the frame count is known.
+    """
+
+    def __init__(self, cap: cv2.VideoCapture, frame_interval: int,
+                 mode: str = 'auto', seek_min_gap: int = 120):
+        if mode not in SAMPLING_MODES:
+            raise ValueError(f"Unknown sampling mode: {mode}")
+        self.cap = cap
+        self.frame_interval = max(1, int(frame_interval))
+        self.total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.mode = self._resolve_mode(mode, seek_min_gap)
+        self.frames_grabbed = 0
+        self.frames_decoded = 0
+        self.seeks = 0
+
+    def _resolve_mode(self, mode: str, seek_min_gap: int) -> str:
+        if mode != 'auto':
+            return mode
+        if self.total_frames > 0 and self.frame_interval >= seek_min_gap:
+            return 'seek'
+        return 'grab'
+
+    def __iter__(self) -> Iterator[Tuple[int, np.ndarray]]:
+        if self.mode == 'seek' and self.total_frames > 0:
+            return self._iter_seek()
+        return self._iter_grab()
+
+    def _iter_grab(self) -> Iterator[Tuple[int, np.ndarray]]:
+        frame_number = 0
+        while True:
+            ret, frame = self.cap.read()
+            if not ret:
+                return
+            self.frames_decoded += 1
+            yield frame_number, frame
+
+            for _ in range(self.frame_interval - 1):
+                if not self.cap.grab():
+                    return
+                self.frames_grabbed += 1
+            frame_number += self.frame_interval
+
+    def _iter_seek(self) -> Iterator[Tuple[int, np.ndarray]]:
+        for frame_number in range(0, self.total_frames, self.frame_interval):
+            if frame_number > 0:
+                self.cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
+                self.seeks += 1
+            ret, frame = self.cap.read()
+            if not ret:
+                return
+            self.frames_decoded += 1
+            yield frame_number, frame
+
+    def get_stats(self) -> dict:
+        return {
+            'mode': self.mode,
+            'frame_interval': self.frame_interval,
+            'frames_decoded': self.frames_decoded,
+            'frames_grabbed': self.frames_grabbed,
+            'seeks': self.seeks
+        }
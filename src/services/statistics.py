@@ -0,0 +1,94 @@
+import argparse
+import json
+import os
+from typing import Any, Dict, Iterator
+
+import numpy as np
+
+from src.services.frame_store import FrameColumns
+
+CONFIDENCE_BINS = 10
+
+
+def iter_entry_detections(entry: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    if 'detections' in entry:
+        yield from entry['detections']
+    elif 'frame_results' in entry:
+        for frame in entry['frame_results']:
+            yield from frame['detections']
+
+
+def confidence_bucket(confidence: float) -> int:
+    return min(max(int(confidence * CONFIDENCE_BINS), 0), CONFIDENCE_BINS - 1)
+
+
+def entry_statistics(entry: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Aggregate deltas contributed by a single history entry.
+    """
+    if entry.get('frame_store'):
+        return _frame_store_statistics(entry)
+
+    classes: Dict[str, int] = {}
+    histogram = [0] * CONFIDENCE_BINS
+    detections = 0
+    for detection in iter_entry_detections(entry):
+        detections += 1
+        classes[detection['class']] = classes.get(detection['class'], 0) + 1
+        histogram[confidence_bucket(detection['confidence'])] += 1
+
+    return {
+        'day': entry['timestamp'][:10],
+        'detections': detections,
+        'classes': classes,
+        'confidence_histogram': histogram
+    }
+
+
+def _frame_store_statistics(entry: Dict[str, Any]) -> Dict[str, Any]:
+    if not os.path.isdir(entry['frame_store']):
+        # Counts survive in the inline summary, confidences do not
+        print(f"Frame store {entry['frame_store']} of history entry {entry.get('id')} is missing, "
+              f"using its summary")
+        classes = dict(entry.get('summary') or {})
+        return {
+            'day': entry['timestamp'][:10],
+            'detections': sum(classes.values()),
+            'classes': classes,
+            'confidence_histogram': [0] * CONFIDENCE_BINS
+        }
+
+    frames = FrameColumns.open(entry['frame_store'])
+    confidence = np.asarray(frames.columns['confidence'], dtype=np.float64)
+    buckets = np.clip((confidence * CONFIDENCE_BINS).astype(np.int64), 0, CONFIDENCE_BINS - 1)
+    return {
+        'day': entry['timestamp'][:10],
+        'detections': len(confidence),
+        'classes': frames.class_counts(),
+        'confidence_histogram': np.bincount(buckets, minlength=CONFIDENCE_BINS).tolist()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rebuild the /report aggregates from the stored history')
+    parser.add_argument('--config', default='config.yaml')
+    args = parser.parse_args()
+
+    from src.config.config import Config
+    from src.services.history import create_history_store
+
+    cfg = Config(args.config)
+    store = create_history_store(cfg.get_history_backend(), cfg.get_history_db_path(), cfg.get_frames_dir())
+
+    before = store.get_statistics()
+    after = store.rebuild_statistics()
+
+    if before == after:
+        print('Aggregates match the stored history, no drift')
+    else:
+        print('Aggregates drifted from the stored history and were rebuilt')
+        print(json.dumps({'before': before, 'after': after}, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+from typing import List, Tuple
+
+import cv2
+import numpy as np
+
+from src.services.detections import extract_boxes
+from src.services.inference_pool import PooledBoxes, PooledResult
+
+# Boxes cut by a tile border lie almost entirely inside the full box found in
+# the neighbouring tile or the whole-image pass, so a box is also dropped when
+# this much of it lies inside a kept box of higher confidence. Separate
+# objects that merely overlap are left alone.
+MERGE_IOS_THRESHOLD = 0.9
+
+
+def _tile_starts(length: int, tile: int, stride: int) -> List[int]:
+    if length <= tile:
+        return [0]
+    starts = list(range(0, length - tile, stride))
+    # The last tile is aligned to the edge, so every tile has the same size
+    starts.append(length - tile)
+    return starts
+
+
+def compute_tiles(width: int, height: int, tile_size: int, overlap: float) -> List[Tuple[int, int, int, int]]:
+    """
+    Overlapping ``(x1, y1, x2, y2)`` tiles of equal size covering the image.
+    """
+    tile_w = min(tile_size, width)
+    tile_h = min(tile_size, height)
+    stride_x = max(1, int(tile_w * (1 - overlap)))
+    stride_y = max(1, int(tile_h * (1 - overlap)))
+    return [
+        (x, y, x + tile_w, y + tile_h)
+        for y in _tile_starts(height, tile_h, stride_y)
+        for x in _tile_starts(width, tile_w, stride_x)
+    ]
+
+
+def merge_detections(xyxy: np.ndarray, conf: np.ndarray, cls: np.ndarray,
+                     iou_threshold: float) -> np.ndarray:
+    """
+    Class-aware greedy NMS over detections from all tiles. Returns the
+    indices of the boxes to keep, highest confidence first.
+
+    Besides IoU, a box is suppressed when it is nested inside a box of the
+    same class kept before it, that is one with a higher confidence.
+    """
+    areas = np.clip(xyxy[:, 2] - xyxy[:, 0], 0, None) * np.clip(xyxy[:, 3] - xyxy[:, 1], 0, None)
+    suppressed = np.zeros(len(conf), dtype=bool)
+    keep = []
+    for i in np.argsort(-conf, kind='stable'):
+        if suppressed[i]:
+            continue
+        keep.append(i)
+        w = np.clip(np.minimum(xyxy[i, 2], xyxy[:, 2]) - np.maximum(xyxy[i, 0], xyxy[:, 0]), 0, None)
+        h = np.clip(np.minimum(xyxy[i, 3], xyxy[:, 3]) - np.maximum(xyxy[i, 1], xyxy[:, 1]), 0, None)
+        intersection = w * h
+        iou = intersection / np.maximum(areas[i] + areas - intersection, 1e-9)
+        nested = intersection / np.maximum(areas, 1e-9)
+        suppressed |= (cls == cls[i]) & ((iou > iou_threshold) | (nested > MERGE_IOS_THRESHOLD))
+    return np.array(keep, dtype=np.int64)
+
+
+def _full_image_boxes(model, image: np.ndarray, size: int, **params):
+    height, width = image.shape[:2]
+    scale = min(1.0, size / max(height, width))
+    if scale < 1.0:
+        image = cv2.resize(image, (max(1, round(width * scale)), max(1, round(height * scale))),
+                           interpolation=cv2.INTER_AREA)
+    xyxy, conf, cls = extract_boxes(model(image, **params))
+    return xyxy / np.float32(scale), conf, cls
+
+
+def tiled_inference(model, image: np.ndarray, tile_size: int, overlap: float,
+                    batch_size: int = 16, full_image: bool = True, **params) -> List[PooledResult]:
+    """
+    Run the model over overlapping tiles of ``image`` in batches and merge
+    the boxes back into image coordinates with a global NMS.
+
+    With ``full_image``, the whole image downscaled to ``tile_size`` is run
+    as well, so objects larger than a tile are found in one piece instead of
+    only as fragments cut by the tile borders.
+
+    Returns a single result shaped like the model's own, so callers iterate
+    and draw it the same way.
+    """
+    height, width = image.shape[:2]
+    tiles = compute_tiles(width, height, tile_size, overlap)
+
+    boxes, scores, classes = [], [], []
+    if full_image:
+        xyxy, conf, cls = _full_image_boxes(model, image, tile_size, **params)
+        boxes.append(xyxy)
+        scores.append(conf)
+        classes.append(cls)
+    for start in range(0, len(tiles), max(1, batch_size)):
+        batch = tiles[start:start + batch_size]
+        results = model([image[y1:y2, x1:x2] for x1, y1, x2, y2 in batch], **params)
+        for (x1, y1, _, _), result in zip(batch, results):
+            xyxy, conf, cls = extract_boxes([result])
+            boxes.append(xyxy + np.array([x1, y1, x1, y1], dtype=np.float32))
+            scores.append(conf)
+            classes.append(cls)
+
+    xyxy = np.concatenate(boxes) if boxes else np.zeros((0, 4), dtype=np.float32)
+    conf = np.concatenate(scores) if scores else np.zeros(0, dtype=np.float32)
+    cls = np.concatenate(classes) if classes else np.zeros(0, dtype=np.int64)
+    keep = merge_detections(xyxy, conf, cls, params.get('iou', 0.7))
+    return [PooledResult(PooledBoxes(xyxy[keep], conf[keep], cls[keep]))]
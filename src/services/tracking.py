@@ -0,0 +1,187 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+FLOW_WIDTH = 320
+
+
+def box_iou(boxes_a: np.ndarray, boxes_b: np.ndarray) -> np.ndarray:
+    """
+    Pairwise IoU of two ``(n, 4)`` / ``(m, 4)`` arrays of xyxy boxes.
+    """
+    if len(boxes_a) == 0 or len(boxes_b) == 0:
+        return np.zeros((len(boxes_a), len(boxes_b)), dtype=np.float32)
+    x1 = np.maximum(boxes_a[:, None, 0], boxes_b[None, :, 0])
+    y1 = np.maximum(boxes_a[:, None, 1], boxes_b[None, :, 1])
+    x2 = np.minimum(boxes_a[:, None, 2], boxes_b[None, :, 2])
+    y2 = np.minimum(boxes_a[:, None, 3], boxes_b[None, :, 3])
+    intersection = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (boxes_a[:, 2] - boxes_a[:, 0]) * (boxes_a[:, 3] - boxes_a[:, 1])
+    area_b = (boxes_b[:, 2] - boxes_b[:, 0]) * (boxes_b[:, 3] - boxes_b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - intersection
+    return np.where(union > 0, intersection / np.maximum(union, 1e-9), 0).astype(np.float32)
+
+
+class IoUTracker:
+    """
+    Greedy IoU association of detections across sampled frames.
+
+    Each detection gets a ``track_id``; a track survives ``max_age`` frames
+    without a match before its id is retired.
+    """
+
+    def __init__(self, iou_threshold: float = 0.3, max_age: int = 2):
+        self.iou_threshold = iou_threshold
+        self.max_age = max_age
+        self._next_id = 1
+        self._tracks: List[Dict[str, Any]] = []
+        self._unique: Dict[str, int] = {}
+
+    def update(self, detections: List[Dict[str, Any]]) -> None:
+        boxes = np.array([d['bbox'] for d in detections], dtype=np.float32).reshape(-1, 4)
+        track_boxes = np.array([t['bbox'] for t in self._tracks], dtype=np.float32).reshape(-1, 4)
+        iou = box_iou(track_boxes, boxes)
+
+        # Only same-class pairs can match
+        for t, track in enumerate(self._tracks):
+            for d, detection in enumerate(detections):
+                if track['class'] != detection['class']:
+                    iou[t, d] = 0
+
+        matched_tracks = set()
+        matched_detections = set()
+        for flat in np.argsort(-iou, axis=None):
+            t, d = divmod(int(flat), iou.shape[1])
+            if iou[t, d] < self.iou_threshold:
+                break
+            if t in matched_tracks or d in matched_detections:
+                continue
+            matched_tracks.add(t)
+            matched_detections.add(d)
+            self._tracks[t].update(bbox=detections[d]['bbox'], age=0)
+            detections[d]['track_id'] = self._tracks[t]['id']
+
+        for t, track in enumerate(self._tracks):
+            if t not in matched_tracks:
+                track['age'] += 1
+        self._tracks = [track for track in self._tracks if track['age'] <= self.max_age]
+
+        for d, detection in enumerate(detections):
+            if d in matched_detections:
+                continue
+            detection['track_id'] = self._next_id
+            self._tracks.append({'id': self._next_id, 'class': detection['class'],
+                                 'bbox': detection['bbox'], 'age': 0})
+            self._unique[detection['class']] = self._unique.get(detection['class'], 0) + 1
+            self._next_id += 1
+
+    def get_unique_counts(self) -> Dict[str, int]:
+        return dict(self._unique)
+
+
+def _small_gray(frame: np.ndarray) -> Tuple[np.ndarray, float]:
+    scale = min(1.0, FLOW_WIDTH / frame.shape[1])
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    if scale < 1.0:
+        gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    return gray, scale
+
+
+class FlowEstimate:
+    """
+    Sparse Lucas-Kanade flow between two frames, in full-resolution pixels.
+    ``frame_size`` is the ``(width, height)`` that shifted boxes are clipped to.
+    """
+
+    def __init__(self, points: np.ndarray, displacements: np.ndarray, frame_size: Tuple[int, int]):
+        self.points = points
+        self.displacements = displacements
+        self.frame_size = frame_size
+
+    @property
+    def motion(self) -> float:
+        if len(self.displacements) == 0:
+            return 0.0
+        return float(np.median(np.linalg.norm(self.displacements, axis=1)))
+
+    def box_displacement(self, bbox: List[float]) -> Tuple[float, float]:
+        """
+        Median displacement of the features inside ``bbox``. Boxes without
+        features of their own follow the global motion.
+        """
+        if len(self.points) == 0:
+            return 0.0, 0.0
+        x1, y1, x2, y2 = bbox
+        inside = ((self.points[:, 0] >= x1) & (self.points[:, 0] <= x2) &
+                  (self.points[:, 1] >= y1) & (self.points[:, 1] <= y2))
+        displacements = self.displacements[inside] if inside.any() else self.displacements
+        dx, dy = np.median(displacements, axis=0)
+        return float(dx), float(dy)
+
+    def max_box_motion(self, bboxes: List[List[float]]) -> float:
+        """
+        Largest displacement of any of ``bboxes``, so one moving object on a
+        static background counts as motion.
+        """
+        return max((float(np.hypot(*self.box_displacement(bbox))) for bbox in bboxes), default=0.0)
+
+    def shift_box(self, bbox: List[float]) -> Optional[List[float]]:
+        """
+        ``bbox`` moved by its displacement and clipped to the frame, or None
+        once it has left the frame.
+        """
+        dx, dy = self.box_displacement(bbox)
+        width, height = self.frame_size
+        x1, y1, x2, y2 = bbox
+        x1, x2 = min(max(x1 + dx, 0.0), width), min(max(x2 + dx, 0.0), width)
+        y1, y2 = min(max(y1 + dy, 0.0), height), min(max(y2 + dy, 0.0), height)
+        if x2 <= x1 or y2 <= y1:
+            return None
+        return [x1, y1, x2, y2]
+
+
+class MotionEstimator:
+    """
+    Estimate motion between consecutive sampled frames on downscaled
+    grayscale copies. Returns ``None`` when the flow cannot be trusted.
+    """
+
+    def __init__(self):
+        self._prev_gray: Optional[np.ndarray] = None
+
+    def estimate(self, frame: np.ndarray) -> Optional[FlowEstimate]:
+        gray, scale = _small_gray(frame)
+        prev_gray, self._prev_gray = self._prev_gray, gray
+        if prev_gray is None or prev_gray.shape != gray.shape:
+            return None
+        frame_size = (frame.shape[1], frame.shape[0])
+
+        features = cv2.goodFeaturesToTrack(prev_gray, maxCorners=200, qualityLevel=0.01, minDistance=7)
+        if features is None:
+            # A featureless frame has nothing that could have moved
+            return FlowEstimate(np.zeros((0, 2), np.float32), np.zeros((0, 2), np.float32), frame_size)
+
+        next_points, status, _ = cv2.calcOpticalFlowPyrLK(prev_gray, gray, features, None)
+        if next_points is None:
+            return None
+        good = status.reshape(-1) == 1
+        if good.sum() < max(4, len(features) // 4):
+            return None
+
+        points = features.reshape(-1, 2)[good] / scale
+        displacements = (next_points.reshape(-1, 2)[good] / scale) - points
+        return FlowEstimate(points, displacements, frame_size)
+
+
+def propagate_detections(detections: List[Dict[str, Any]], flow: FlowEstimate) -> List[Dict[str, Any]]:
+    """
+    Carry the previous frame's detections forward along the flow, dropping
+    those that moved out of the frame.
+    """
+    propagated = []
+    for d in detections:
+        bbox = flow.shift_box(d['bbox'])
+        if bbox is not None:
+            propagated.append({'class': d['class'], 'confidence': d['confidence'], 'bbox': bbox})
+    return propagated
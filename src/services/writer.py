@@ -0,0 +1,105 @@
+import queue
+import threading
+from typing import Any, Callable, List, Optional
+
+from src.services.metrics import stage
+from src.utils.helpers import encode_image, make_thumbnail
+
+OUTPUT_FORMATS = ('jpeg', 'webp', 'thumbnail', 'none')
+
+
+def get_output_extension(output_format: str) -> str:
+    return '.webp' if output_format == 'webp' else '.jpg'
+
+
+class WriteBatch:
+    """
+    The writes submitted for one request or job. ``wait()`` is the flush step:
+    it returns once every write has landed and re-raises the first failure.
+    """
+
+    def __init__(self):
+        self._pending = 0
+        self._cond = threading.Condition()
+        self.errors: List[BaseException] = []
+
+    def _add(self) -> None:
+        with self._cond:
+            self._pending += 1
+
+    def _done(self, error: Optional[BaseException] = None) -> None:
+        with self._cond:
+            self._pending -= 1
+            if error is not None:
+                self.errors.append(error)
+            if self._pending == 0:
+                self._cond.notify_all()
+
+    def wait(self, timeout: Optional[float] = None) -> None:
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._pending == 0, timeout):
+                raise TimeoutError(f'{self._pending} result images were not written in time')
+        if self.errors:
+            raise self.errors[0]
+
+
+class ImageWriter:
+    """
+    Background pool that encodes and writes result images.
+
+    Encoding releases the GIL, so a few threads keep up with inference while
+    the caller moves on to the next batch. The queue is bounded: once
+    ``queue_size`` writes are waiting, ``write`` blocks, which keeps a fast
+    producer from piling up decoded frames in memory.
+    """
+
+    def __init__(self, workers: int = 2, queue_size: int = 64):
+        self.workers = max(1, workers)
+        self._queue: queue.Queue = queue.Queue(maxsize=max(1, queue_size))
+        self._threads: List[threading.Thread] = []
+        self._start_lock = threading.Lock()
+
+    def start(self) -> None:
+        with self._start_lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._worker, name=f'image-writer-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def write(self, batch: WriteBatch, path: str, image: Any = None, data: Optional[bytes] = None,
+              output_format: str = 'jpeg', quality: int = 95, thumbnail_width: Optional[int] = None,
+              on_done: Optional[Callable[[bytes], None]] = None) -> None:
+        """
+        Queue ``image`` (a BGR array the caller no longer touches) for
+        encoding, or already encoded ``data``, to be written to ``path``.
+        ``on_done`` receives the written bytes.
+        """
+        self.start()
+        batch._add()
+        self._queue.put((batch, path, image, data, output_format, quality, thumbnail_width, on_done))
+
+    def get_queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def _worker(self) -> None:
+        while True:
+            batch, path, image, data, output_format, quality, thumbnail_width, on_done = self._queue.get()
+            try:
+                if data is None:
+                    with stage('encode'):
+                        if output_format == 'thumbnail' and thumbnail_width and image.shape[1] > thumbnail_width:
+                            image = make_thumbnail(image, thumbnail_width)
+                        data = encode_image(image, output_format, quality)
+                with stage('write'):
+                    with open(path, 'wb') as f:
+                        f.write(data)
+                if on_done is not None:
+                    on_done(data)
+            except Exception as e:
+                print(f'Failed to write {path}: {e}')
+                batch._done(e)
+            else:
+                batch._done()
+
@@ -1,32 +1,81 @@
 import cv2
 from PIL import Image
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
 import datetime
 import io
+import os
 
 import numpy as np
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter, landscape
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image as ReportLabImage
-from reportlab.lib.styles import getSampleStyleSheet
 
-def draw_detections(image, results):
-    img = np.array(image)
-    if len(img.shape) == 2:
-        img = cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
-    
-    for result in results:
-        boxes = result.boxes
-        for box in boxes:
-            x1, y1, x2, y2 = map(int, box.xyxy[0].tolist())
-            
-            cv2.rectangle(img, (x1, y1), (x2, y2), (0, 255, 0), 2)
-    
-    return Image.fromarray(img)
+def decode_image(image_bytes):
+    """
+    Decode uploaded bytes straight into a BGR NumPy array, the layout the
+    model, drawing and encoding all work on.
+    """
+    img = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if img is None:
+        # Formats OpenCV cannot read still go through PIL
+        try:
+            image = Image.open(io.BytesIO(image_bytes)).convert('RGB')
+        except Exception:
+            return None
+        img = cv2.cvtColor(np.asarray(image), cv2.COLOR_RGB2BGR)
+    return img
 
-def create_pdf(pdf_filename, video_entry):
+def encode_jpeg(img, quality=95):
+    ok, buffer = cv2.imencode('.jpg', img, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise ValueError('Could not encode image')
+    return buffer.tobytes()
+
+def encode_image(img, image_format='jpeg', quality=95):
+    """
+    Encode a BGR image as ``jpeg`` or ``webp`` at the given quality.
+    """
+    if image_format == 'webp':
+        ok, buffer = cv2.imencode('.webp', img, [cv2.IMWRITE_WEBP_QUALITY, quality])
+        if not ok:
+            raise ValueError('Could not encode image')
+        return buffer.tobytes()
+    return encode_jpeg(img, quality)
+
+def make_thumbnail(img, width):
+    height = max(1, int(round(img.shape[0] * width / img.shape[1])))
+    return cv2.resize(img, (width, height), interpolation=cv2.INTER_AREA)
+
+def dated_dir(base, when=None):
+    """
+    ``base/YYYY/MM/DD`` for the given datetime (default now), so no single
+    directory collects every file ever written.
+    """
+    when = when or datetime.datetime.now()
+    return os.path.join(base, when.strftime('%Y'), when.strftime('%m'), when.strftime('%d'))
+
+def draw_boxes(img, bboxes):
+    """
+    Draw xyxy boxes on a NumPy image in place and return it.
+    """
+    # One conversion for all boxes; truncates like int() did per coordinate
+    corners = np.asarray(bboxes, dtype=np.float64).reshape(-1, 4).astype(np.int64).tolist()
+    for x1, y1, x2, y2 in corners:
+        cv2.rectangle(img, (x1, y1), (x2, y2), (0, 255, 0), 2)
+    
+    return img
+
+def create_pdf(pdf_filename, video_entry, frames, sample_count=6):
+    """
+    Render the PDF report of a video entry. ``frames`` holds its per-frame
+    detections as columns (``FrameColumns``); only the frame numbers, the
+    detection counts and the sample frames are read from them.
+    """
+    # matplotlib and reportlab take most of the import time of the app, and
+    # only report generation needs them
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import letter, landscape
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image as ReportLabImage
+    from reportlab.lib.styles import getSampleStyleSheet
+    
     doc = SimpleDocTemplate(pdf_filename, pagesize=landscape(letter))
     elements = []
     styles = getSampleStyleSheet()
@@ -43,7 +92,7 @@ def create_pdf(pdf_filename, video_entry):
     video_info = [
         ['Video ID', f"{video_entry['id']}"] ,
         ['Analysis Date', f"{video_entry['timestamp'][:19].replace('T', ' ')}"] ,
-        ['Total Frames Processed', f"{len(video_entry['frame_results'])}"]
+        ['Total Frames Processed', f"{len(frames)}"]
     ]
     
     info_table = Table(video_info)
@@ -62,12 +111,19 @@ def create_pdf(pdf_filename, video_entry):
     
     total_detections = sum(video_entry['summary'].values())
     
+    # Tracked videos know how many distinct objects they saw; older entries
+    # only know the detected classes
+    unique_objects = video_entry.get('unique_objects')
     stats_data = [
         ['Metric', 'Values'],
         ['Total Detections', str(total_detections)],
-        ['Unique Objects', str(len(video_entry['summary']))]
+        ['Unique Objects', str(sum(unique_objects.values()) if unique_objects else len(video_entry['summary']))]
     ]
     
+    if unique_objects:
+        for class_name, count in unique_objects.items():
+            stats_data.append([f"Unique {class_name}", str(count)])
+    
     for class_name, count in video_entry['summary'].items():
         stats_data.append([f"{class_name} Count", str(count)])
     
@@ -91,21 +147,21 @@ def create_pdf(pdf_filename, video_entry):
     elements.append(stats_table)
     elements.append(Spacer(1, 24))
     
-    plt.figure(figsize=(10, 5))
-    
-    frame_numbers = [frame['frame_number'] for frame in video_entry['frame_results']]
-    detections_count = [len(frame['detections']) for frame in video_entry['frame_results']]
+    # A standalone Figure with its own Agg canvas keeps no pyplot global
+    # state, so reports can render on several threads at once
+    fig = Figure(figsize=(10, 5))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
     
-    plt.plot(frame_numbers, detections_count, marker='o', linewidth=2, markersize=6)
-    plt.title('Detections per Frame')
-    plt.xlabel('Frame Number')
-    plt.ylabel('Number of Detections')
-    plt.grid(True, alpha=0.3)
+    ax.plot(frames.frame_numbers, frames.detection_counts, marker='o', linewidth=2, markersize=6)
+    ax.set_title('Detections per Frame')
+    ax.set_xlabel('Frame Number')
+    ax.set_ylabel('Number of Detections')
+    ax.grid(True, alpha=0.3)
     
     img_buffer = io.BytesIO()
-    plt.savefig(img_buffer, format='png', dpi=100, bbox_inches='tight')
+    fig.savefig(img_buffer, format='png', dpi=100, bbox_inches='tight')
     img_buffer.seek(0)
-    plt.close()
     
     img = ReportLabImage(img_buffer, width=500, height=250)
     elements.append(img)
@@ -114,13 +170,15 @@ def create_pdf(pdf_filename, video_entry):
     elements.append(Paragraph("Sample Frames with Detections:", styles['Heading2']))
     elements.append(Spacer(1, 12))
     
-    sample_frames = video_entry['frame_results'][:6]
+    sample_frames = frames.to_frame_results(0, sample_count)
     for frame in sample_frames:
         frame_info = f"Frame {frame['frame_number']} - {len(frame['detections'])} detections"
         elements.append(Paragraph(frame_info, styles['Normal']))
         
-        frame_img = ReportLabImage(frame['result_image'], width=300, height=200)
-        elements.append(frame_img)
+        # Thumbnails made at analysis time spare loading full-size frames
+        image_path = frame.get('thumbnail') or frame.get('result_image')
+        if image_path:
+            elements.append(ReportLabImage(image_path, width=300, height=200))
         elements.append(Spacer(1, 12))
     
     doc.build(elements)
\ No newline at end of file
@@ -0,0 +1,148 @@
+import hashlib
+import http.server
+import os
+import threading
+import time
+
+import pytest
+
+from src.services import model_store
+from src.services.model_store import ModelArtifactStore, ModelDownloadError
+
+PAYLOAD = os.urandom(256 * 1024)
+PAYLOAD_SHA256 = hashlib.sha256(PAYLOAD).hexdigest()
+
+
+class _WeightsHandler(http.server.BaseHTTPRequestHandler):
+    # Serves PAYLOAD with Range support. The server's ``cut_after`` makes the
+    # next full response stop after that many bytes, like a dropped connection.
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests.append(self.headers.get('Range'))
+            cut_after, server.cut_after = server.cut_after, None
+        time.sleep(server.delay)
+
+        start = 0
+        range_header = self.headers.get('Range')
+        if range_header:
+            start = int(range_header.split('=')[1].split('-')[0])
+            if start >= len(PAYLOAD):
+                self.send_response(416)
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{len(PAYLOAD) - 1}/{len(PAYLOAD)}')
+        else:
+            self.send_response(200)
+        body = PAYLOAD[start:]
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if cut_after is not None:
+            self.wfile.write(body[:cut_after])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), _WeightsHandler)
+    httpd.lock = threading.Lock()
+    httpd.requests = []
+    httpd.cut_after = None
+    httpd.delay = 0.0
+    httpd.url = f'http://127.0.0.1:{httpd.server_address[1]}/yolov8n.pt'
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(model_store.time, 'sleep', lambda seconds: None)
+
+
+def test_fetch_resumes_interrupted_download_with_range(server, tmp_path):
+    server.cut_after = len(PAYLOAD) // 3
+    store = ModelArtifactStore(str(tmp_path), timeout=5, retries=2, chunk_size=4096)
+
+    path = store.fetch(server.url, 'yolov8n.pt', sha256=PAYLOAD_SHA256)
+
+    # The resume starts after the last chunk that reached the disk
+    assert len(server.requests) == 2 and server.requests[0] is None
+    offset = int(server.requests[1][len('bytes='):-1])
+    assert 0 < offset <= len(PAYLOAD) // 3
+    with open(path, 'rb') as f:
+        assert f.read() == PAYLOAD
+    assert not os.path.exists(f'{path}.part')
+    with open(f'{path}.sha256', 'r', encoding='utf-8') as f:
+        assert f.read() == PAYLOAD_SHA256
+
+
+def test_fetch_resumes_partial_file_left_by_earlier_process(server, tmp_path):
+    store = ModelArtifactStore(str(tmp_path), timeout=5, retries=0)
+    path = store.get_path(server.url, 'yolov8n.pt', sha256=PAYLOAD_SHA256)
+    os.makedirs(os.path.dirname(path))
+    with open(f'{path}.part', 'wb') as f:
+        f.write(PAYLOAD[:1000])
+
+    assert store.fetch(server.url, 'yolov8n.pt', sha256=PAYLOAD_SHA256) == path
+    assert server.requests == ['bytes=1000-']
+    with open(path, 'rb') as f:
+        assert f.read() == PAYLOAD
+
+
+def test_fetch_rejects_checksum_mismatch(server, tmp_path):
+    store = ModelArtifactStore(str(tmp_path), timeout=5, retries=0)
+    wrong_sha256 = hashlib.sha256(b'other weights').hexdigest()
+
+    with pytest.raises(ModelDownloadError, match='Checksum mismatch'):
+        store.fetch(server.url, 'yolov8n.pt', sha256=wrong_sha256)
+
+    path = store.get_path(server.url, 'yolov8n.pt', sha256=wrong_sha256)
+    assert not os.path.exists(path)
+    assert not os.path.exists(f'{path}.part')
+
+
+def test_fetch_reuses_verified_cache_without_downloading(server, tmp_path):
+    store = ModelArtifactStore(str(tmp_path), timeout=5, retries=0)
+    first = store.fetch(server.url, 'yolov8n.pt', sha256=PAYLOAD_SHA256)
+    second = store.fetch(server.url, 'yolov8n.pt', sha256=PAYLOAD_SHA256)
+
+    assert first == second
+    assert server.requests == [None]
+
+
+@pytest.mark.skipif(model_store.fcntl is None, reason='file locks need fcntl')
+def test_concurrent_fetches_download_once(server, tmp_path):
+    # The slow response keeps the first download holding the lock while
+    # the others arrive
+    server.delay = 0.3
+    results, errors = [], []
+
+    def fetch():
+        store = ModelArtifactStore(str(tmp_path), timeout=5, retries=0)
+        try:
+            results.append(store.fetch(server.url, 'yolov8n.pt', sha256=PAYLOAD_SHA256))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=fetch) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert len(set(results)) == 1
+    assert server.requests == [None]
+    with open(results[0], 'rb') as f:
+        assert f.read() == PAYLOAD